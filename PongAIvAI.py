@@ -19,11 +19,17 @@
 
 
 
-import pygame, sys, time, random, os
+import pygame, time
 from pygame.locals import *
 
-import math
+import contextlib
 
+import bot_sandbox
+import pong_engine
+import profiler
+import results_cache
+import tournament
+from pong_engine import Paddle, Ball, check_point
 
 
 
@@ -32,196 +38,6 @@ white = [255, 255, 255]
 black = [0, 0, 0]
 clock = pygame.time.Clock()
 
-class fRect:
-    '''
-    pygame's Rect class can only be used to represent whole integer vertices, so we create a rectangle class that can have floating point coordinates
-    '''
-    def __init__(self, pos, size):
-        self.pos = (pos[0], pos[1])
-        self.size = (size[0], size[1])
-    def move(self, x, y):
-        return fRect((self.pos[0]+x, self.pos[1]+y), self.size)
-
-    def move_ip(self, x, y, move_factor = 1):
-        self.pos = (self.pos[0] + x*move_factor, self.pos[1] + y*move_factor)
-
-    def get_rect(self):
-        return Rect(self.pos, self.size)
-
-    def copy(self):
-        return fRect(self.pos, self.size)
-
-    def intersect(self, other_frect):
-        # two rectangles intersect iff both x and y projections intersect
-        for i in range(2):
-            if self.pos[i] < other_frect.pos[i]: # projection of self begins to the left
-                if other_frect.pos[i] >= self.pos[i] + self.size[i]:
-                    return 0
-            elif self.pos[i] > other_frect.pos[i]:
-                if self.pos[i] >= other_frect.pos[i] + other_frect.size[i]:
-                    return 0
-        return 1#self.size > 0 and other_frect.size > 0
-
-
-class Paddle:
-    def __init__(self, pos, size, speed, max_angle,  facing, timeout):
-        self.frect = fRect((pos[0]-size[0]/2, pos[1]-size[1]/2), size)
-        self.speed = speed
-        self.size = size
-        self.facing = facing
-        self.max_angle = max_angle
-        self.timeout = timeout
-
-    def factor_accelerate(self, factor):
-        self.speed = factor*self.speed
-
-
-    def move(self, enemy_frect, ball_frect, table_size):
-        direction = self.move_getter(self.frect.copy(), enemy_frect.copy(), ball_frect.copy(), tuple(table_size))
-        # direction = timeout(self.move_getter, (self.frect.copy(), enemy_frect.copy(), ball_frect.copy(), tuple(table_size)), {}, self.timeout)
-        if direction == "up":
-            self.frect.move_ip(0, -self.speed)
-        elif direction == "down":
-            self.frect.move_ip(0, self.speed)
-
-        to_bottom = (self.frect.pos[1]+self.frect.size[1])-table_size[1]
-
-        if to_bottom > 0:
-            self.frect.move_ip(0, -to_bottom)
-        to_top = self.frect.pos[1]
-        if to_top < 0:
-            self.frect.move_ip(0, -to_top)
-
-
-    def get_face_pts(self):
-        return ((self.frect.pos[0] + self.frect.size[0]*self.facing, self.frect.pos[1]),
-                (self.frect.pos[0] + self.frect.size[0]*self.facing, self.frect.pos[1] + self.frect.size[1]-1)
-                )
-
-    def get_angle(self, y):
-        center = self.frect.pos[1]+self.size[1]/2
-        rel_dist_from_c = ((y-center)/self.size[1])
-        rel_dist_from_c = min(0.5, rel_dist_from_c)
-        rel_dist_from_c = max(-0.5, rel_dist_from_c)
-        sign = 1-2*self.facing
-
-        return sign*rel_dist_from_c*self.max_angle*math.pi/180
-
-
-
-
-
-class Ball:
-    def __init__(self, table_size, size, paddle_bounce, wall_bounce, dust_error, init_speed_mag):
-        rand_ang = (.4+.4*random.random())*math.pi*(1-2*(random.random()>.5))+.5*math.pi
-        #rand_ang = -110*math.pi/180
-        speed = (init_speed_mag*math.cos(rand_ang), init_speed_mag*math.sin(rand_ang))
-        pos = (table_size[0]/2, table_size[1]/2)
-        #pos = (table_size[0]/2 - 181, table_size[1]/2 - 105)
-        self.frect = fRect((pos[0]-size[0]/2, pos[1]-size[1]/2), size)
-        self.speed = speed
-        self.size = size
-        self.paddle_bounce = paddle_bounce
-        self.wall_bounce = wall_bounce
-        self.dust_error = dust_error
-        self.init_speed_mag = init_speed_mag
-        self.prev_bounce = None
-
-    def get_center(self):
-        return (self.frect.pos[0] + .5*self.frect.size[0], self.frect.pos[1] + .5*self.frect.size[1])
-
-
-    def get_speed_mag(self):
-        return math.sqrt(self.speed[0]**2+self.speed[1]**2)
-
-    def factor_accelerate(self, factor):
-        self.speed = (factor*self.speed[0], factor*self.speed[1])
-
-
-
-    def move(self, paddles, table_size, move_factor):
-        moved = 0
-        walls_Rects = [Rect((-100, -100), (table_size[0]+200, 100)),
-                       Rect((-100, table_size[1]), (table_size[0]+200, 100))]
-
-        for wall_rect in walls_Rects:
-            if self.frect.get_rect().colliderect(wall_rect):
-                c = 0
-                #print "in wall. speed: ", self.speed
-                while self.frect.get_rect().colliderect(wall_rect):
-                    self.frect.move_ip(-.1*self.speed[0], -.1*self.speed[1], move_factor)
-                    c += 1 # this basically tells us how far the ball has traveled into the wall
-                r1 = 1+2*(random.random()-.5)*self.dust_error
-                r2 = 1+2*(random.random()-.5)*self.dust_error
-
-                self.speed = (self.wall_bounce*self.speed[0]*r1, -self.wall_bounce*self.speed[1]*r2)
-                while c > 0 or self.frect.get_rect().colliderect(wall_rect):
-                    self.frect.move_ip(.1*self.speed[0], .1*self.speed[1], move_factor)
-                    c -= 1 # move by roughly the same amount as the ball had traveled into the wall
-                moved = 1
-                #print "out of wall, position, speed: ", self.frect.pos, self.speed
-
-        for paddle in paddles:
-            if self.frect.intersect(paddle.frect):
-                if (paddle.facing == 1 and self.get_center()[0] < paddle.frect.pos[0] + paddle.frect.size[0]/2) or \
-                (paddle.facing == 0 and self.get_center()[0] > paddle.frect.pos[0] + paddle.frect.size[0]/2):
-                    continue
-                
-                c = 0
-                
-                while self.frect.intersect(paddle.frect) and not self.frect.get_rect().colliderect(walls_Rects[0]) and not self.frect.get_rect().colliderect(walls_Rects[1]):
-                    self.frect.move_ip(-.1*self.speed[0], -.1*self.speed[1], move_factor)
-                    
-                    c += 1
-                theta = paddle.get_angle(self.frect.pos[1]+.5*self.frect.size[1])
-                
-
-                v = self.speed
-
-                v = [math.cos(theta)*v[0]-math.sin(theta)*v[1],
-                             math.sin(theta)*v[0]+math.cos(theta)*v[1]]
-
-                v[0] = -v[0]
-
-                v = [math.cos(-theta)*v[0]-math.sin(-theta)*v[1],
-                              math.cos(-theta)*v[1]+math.sin(-theta)*v[0]]
-
-
-                # Bona fide hack: enforce a lower bound on horizontal speed and disallow back reflection
-                if  v[0]*(2*paddle.facing-1) < 1: # ball is not traveling (a) away from paddle (b) at a sufficient speed
-                    v[1] = (v[1]/abs(v[1]))*math.sqrt(v[0]**2 + v[1]**2 - 1) # transform y velocity so as to maintain the speed
-                    v[0] = (2*paddle.facing-1) # note that minimal horiz speed will be lower than we're used to, where it was 0.95 prior to increase by *1.2
-
-                #a bit hacky, prevent multiple bounces from accelerating
-                #the ball too much
-                if not paddle is self.prev_bounce:
-                    self.speed = (v[0]*self.paddle_bounce, v[1]*self.paddle_bounce)
-                else:
-                    self.speed = (v[0], v[1])
-                self.prev_bounce = paddle
-                #print "transformed speed: ", self.speed
-
-                while c > 0 or self.frect.intersect(paddle.frect):
-                    #print "move_ip()"
-                    self.frect.move_ip(.1*self.speed[0], .1*self.speed[1], move_factor)
-                    #print "ball position forward trace: ", self.frect.pos
-                    c -= 1
-                #print "pos final: (" + str(self.frect.pos[0]) + "," + str(self.frect.pos[1]) + ")"
-                #print "speed x y: ", self.speed[0], self.speed[1]
-
-                moved = 1
-                #print "out of paddle, speed: ", self.speed
-
-        # if we didn't take care of not driving the ball into a wall by backtracing above it could have happened that
-        # we would end up inside the wall here due to the way we do paddle bounces
-        # this happens because we backtrace (c++) using incoming velocity, but correct post-factum (c--) using new velocity
-        # the velocity would then be transformed by a wall hit, and the ball would end up on the dark side of the wall
-
-        if not moved:
-            self.frect.move_ip(self.speed[0], self.speed[1], move_factor)
-            #print "moving "
-        #print "poition: ", self.frect.pos
-
 
 def directions_from_input(paddle_rect, other_paddle_rect, ball_rect, table_size):
     keys = pygame.key.get_pressed()
@@ -236,118 +52,117 @@ def directions_from_input(paddle_rect, other_paddle_rect, ball_rect, table_size)
 
 
 
-def timeout(func, args=(), kwargs={}, timeout_duration=1, default=None):
-    '''From:
-    http://code.activestate.com/recipes/473878-timeout-function-using-threading/'''
-    import threading
-    class InterruptableThread(threading.Thread):
-        def __init__(self):
-            threading.Thread.__init__(self)
-            self.result = None
+fonts = {}
+text_surfaces = {}
 
-        def run(self):
-            try:
-                self.result = func(*args, **kwargs)
-            except:
-                self.result = default
 
-    it = InterruptableThread()
-    it.start()
-    it.join(timeout_duration)
-    if it.is_alive():
-        print("TIMEOUT")
-        return default
-    else:
-        return it.result
+def get_font(size):
+    if size not in fonts:
+        fonts[size] = pygame.font.Font(None, size)
+    return fonts[size]
 
-def render(screen, paddles, ball, score, table_size):
-    screen.fill(black)
 
-    pygame.draw.rect(screen, white, paddles[0].frect.get_rect())
-    pygame.draw.rect(screen, white, paddles[1].frect.get_rect())
-
-    pygame.draw.circle(screen, white, (int(ball.get_center()[0]), int(ball.get_center()[1])),  int(ball.frect.size[0]/2), 0)
+def text_surface(text, size, background=None):
+    '''
+    text rendered in white, cached: scores and messages are only rendered the first time they are shown
+    '''
+    key = (text, size, None if background is None else tuple(background))
+    if key not in text_surfaces:
+        text_surfaces[key] = get_font(size).render(text, True, white, background)
+    return text_surfaces[key]
 
 
-    pygame.draw.line(screen, white, [screen.get_width()/2, 0], [screen.get_width()/2, screen.get_height()])
+def draw(screen, paddles, ball, score, table_size):
+    '''
+    Draw the table onto screen, which can be the window or any other Surface (see replay_export), and return the
+    rectangles of the paddles, ball and scores
+    '''
+    screen.fill(black)
 
-    score_font = pygame.font.Font(None, 32)
-    screen.blit(score_font.render(str(score[0]), True, white), [int(0.4*table_size[0])-8, 0])
-    screen.blit(score_font.render(str(score[1]), True, white), [int(0.6*table_size[0])-8, 0])
+    rects = [pygame.draw.rect(screen, white, paddles[0].frect.get_rect()),
+             pygame.draw.rect(screen, white, paddles[1].frect.get_rect())]
 
-    pygame.display.flip()
+    center = ball.get_center()
+    rects.append(pygame.draw.circle(screen, white, (int(center[0]), int(center[1])),  int(ball.frect.size[0]/2), 0))
 
 
+    pygame.draw.line(screen, white, [screen.get_width()/2, 0], [screen.get_width()/2, screen.get_height()])
 
-def check_point(score, ball, table_size):
-    if ball.frect.pos[0]+ball.size[0]/2 < 0:
-        score[1] += 1
-        ball = Ball(table_size, ball.size, ball.paddle_bounce, ball.wall_bounce, ball.dust_error, ball.init_speed_mag)
-        return (ball, score)
-    elif ball.frect.pos[0]+ball.size[0]/2 >= table_size[0]:
-        ball = Ball(table_size, ball.size, ball.paddle_bounce, ball.wall_bounce, ball.dust_error, ball.init_speed_mag)
-        score[0] += 1
-        return (ball, score)
+    rects.append(screen.blit(text_surface(str(score[0]), 32), [int(0.4*table_size[0])-8, 0]))
+    rects.append(screen.blit(text_surface(str(score[1]), 32), [int(0.6*table_size[0])-8, 0]))
+    return rects
 
-    return (ball, score)
 
+def render(screen, paddles, ball, score, table_size, previous_rects=None):
+    '''
+    Draw the table and show it. Given the rectangles returned by the previous render, only the parts of the window
+    where something moved are updated, otherwise the whole window is. Returns the rectangles for the next render
+    '''
+    rects = draw(screen, paddles, ball, score, table_size)
+    if previous_rects is None:
+        pygame.display.flip()
+    else:
+        pygame.display.update(previous_rects + rects)
+    return rects
 
-def game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, display):
-    score = [0, 0]
 
 
+def game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, display, render_fps=60):
+    if not display:
+        # nothing to draw, so let the pygame-free engine play the whole match
+        score = pong_engine.game_loop(paddles, ball, table_size, score_to_win)
+        print(score)
+        return score
 
+    score = [0, 0]
+    for paddle in paddles:
+        paddle.bot.reset()
 
+    # the match is simulated at clock_rate frames per second (as fast as possible with 0), but only drawn
+    # render_fps times per second
+    rects = render(screen, paddles, ball, score, table_size)
+    render_interval = 1/render_fps
+    next_render = time.perf_counter() + render_interval
 
     while max(score) < score_to_win:
         old_score = score[:]
         ball, score = check_point(score, ball, table_size)
-        paddles[0].move(paddles[1].frect, ball.frect, table_size)
-        paddles[1].move(paddles[0].frect, ball.frect, table_size)
-        
-        inv_move_factor = int((ball.speed[0]**2+ball.speed[1]**2)**.5)
-        if inv_move_factor > 0:
-            for i in range(inv_move_factor):
-                ball.move(paddles, table_size, 1./inv_move_factor)
-        else:
-            ball.move(paddles, table_size, 1)
-        
-        
-        if not display:
-            continue
+        pong_engine.step(paddles, ball, table_size)
+
         if score != old_score:
-            font = pygame.font.Font(None, 32)
             if score[0] != old_score[0]:
-                screen.blit(font.render("Left scores!", True, white, black), [0, 32])
+                screen.blit(text_surface("Left scores!", 32, black), [0, 32])
             else:
-                screen.blit(font.render("Right scores!", True, white, black), [int(table_size[0]/2+20), 32])
+                screen.blit(text_surface("Right scores!", 32, black), [int(table_size[0]/2+20), 32])
 
 
             pygame.display.flip()
-            clock.tick(turn_wait_rate)
+            if turn_wait_rate:
+                pygame.time.delay(int(1000/turn_wait_rate))
+            rects = None  # the message has to be cleared from the whole window
 
 
 
-        render(screen, paddles, ball, score, table_size)
+        now = time.perf_counter()
+        if rects is None or now >= next_render:
+            rects = render(screen, paddles, ball, score, table_size, rects)
+            next_render = max(next_render + render_interval, now)
 
 
 
-        pygame.event.pump()
-        keys = pygame.key.get_pressed()
-        if keys[K_q]:
-            return
+            pygame.event.pump()
+            keys = pygame.key.get_pressed()
+            if keys[K_q]:
+                return
 
 
 
-        clock.tick(clock_rate)
+        if clock_rate:
+            clock.tick(clock_rate)
 
-    font = pygame.font.Font(None, 64)
-    if score[0] > score[1]:
-        screen.blit(font.render("Left wins!", True, white, black), [24, 32])
-    else:
-        screen.blit(font.render("Right wins!", True, white, black), [24, 32])
+    screen.blit(text_surface("Left wins!" if score[0] > score[1] else "Right wins!", 64, black), [24, 32])
     pygame.display.flip()
-    clock.tick(2)
+    pygame.time.delay(500)
 
     pygame.event.pump()
     while any(pygame.key.get_pressed()):
@@ -357,6 +172,12 @@ def game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, sco
     print(score)
     return score
 
+def new_profile(timeout):
+    profile = profiler.Profile(budget=timeout)
+    profile.instrument('pong_ai_new', 'calculate_ball_target', 'calculate_landing_spot', 'paddle_hit_ball_min_distance')
+    return profile
+
+
 def init_game():
     table_size = (440, 280)
     paddle_size = (10, 70)
@@ -369,14 +190,12 @@ def init_game():
     dust_error = 0.00
     init_speed_mag = 2
     timeout = 0.0003
-    clock_rate = 80
+    clock_rate = 80  # simulated frames per second in display mode (0: as fast as possible)
+    render_fps = 60  # frames drawn per second in display mode
     turn_wait_rate = 1
     score_to_win = 5
 
 
-    screen = pygame.display.set_mode(table_size)
-    pygame.display.set_caption('PongAIvAI')
-
     paddles = [Paddle((20, table_size[1]/2), paddle_size, paddle_speed, max_angle,  1, timeout),
                Paddle((table_size[0]-20, table_size[1]/2), paddle_size, paddle_speed, max_angle, 0, timeout)]
     ball = Ball(table_size, ball_size, paddle_bounce, wall_bounce, dust_error, init_speed_mag)
@@ -389,54 +208,103 @@ def init_game():
     import pong_ai_new
     
     auto_testing = True
-
-    paddles[0].move_getter = pong_ai_new.pong_ai
-    paddles[1].move_getter = pong_ai.pong_ai  # directions_from_input  # chaser_ai.pong_ai
+    sequential_testing = False  # stop auto testing as soon as it is clear which bot is better, instead of after 1000 pairs
+    seed = None  # e.g. 2022: auto testing plays the same games every run (None: new random games every run)
+    cache_results = False  # with a seed, reuse the results of games played before with the same bots and physics
+    results_log = None  # e.g. 'results.log': record every game in this file, and continue from it after an interruption
+    print_every = 25  # pairs between two prints of the scores
+    enforce_timeout = False  # drop every move a bot takes longer than `timeout` seconds to decide, as in the contest
+    sandbox = False  # run every bot in a process of its own, so a crashing bot cannot take the game down with it
+    profile_bots = False  # print how long the bots (and pong_ai_new's main helpers) take per call at the end
+
+    paddles[0].move_getter = pong_ai_new.PongAI()
+    paddles[1].move_getter = pong_ai.PongAI()  # directions_from_input  # chaser_ai.pong_ai
 
     if auto_testing:
+        # auto testing never draws anything, so no window is opened and pygame is not needed by the engine
         clock_rate = 0
         turn_wait_rate = 0
         score_to_win = 1
 
-        scores = {}
-    
-        scores['0'] = 0
-        scores['1'] = 0
+        config = {'table_size': table_size, 'paddle_size': paddle_size, 'ball_size': ball_size,
+                  'paddle_speed': paddle_speed, 'max_angle': max_angle, 'paddle_bounce': paddle_bounce,
+                  'wall_bounce': wall_bounce, 'dust_error': dust_error, 'init_speed_mag': init_speed_mag,
+                  'timeout': timeout}
+        bots = (paddles[0].move_getter, paddles[1].move_getter)
+        profile = new_profile(timeout) if profile_bots else None
+        # only seeded results can be reused
+        cache = results_cache.ResultsCache() if cache_results and seed is not None else None
+
+        if sequential_testing:
+            def print_progress(result):
+                if result['pairs'] % print_every == 0:
+                    print(result['scores'])
+
+            # at most 1000 side-swapped pairs, spread over every core
+            result = tournament.sequential_test(bots, 1000, config, score_to_win, enforce_timeout=enforce_timeout, sandbox=sandbox, profile=profile,
+                                                seed=seed, cache=cache, log=results_log, progress=print_progress)
+            if result['winner'] is None:
+                print('No clear winner after %d pairs' % result['pairs'])
+            else:
+                print('Bot %s is better after %d pairs' % (result['winner'], result['pairs']))
+            print(result['scores'])
+            print('Bot 0 won %.1f%% of the points (95%% confidence interval %.1f%% to %.1f%%)' % (
+                100*result['win_rate'], 100*result['interval'][0], 100*result['interval'][1]))
+        else:
+            scores = {}
 
-        for i in range(1000):
-            game_score = game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, 0)
-            scores['0'] += game_score[0]
-            scores['1'] += game_score[1]
-            ball = Ball(table_size, ball_size, paddle_bounce, wall_bounce, dust_error, init_speed_mag)
-            
-            pygame.display.flip()
-            clock.tick()
-            
-            paddles[0].move_getter, paddles[1].move_getter = paddles[1].move_getter, paddles[0].move_getter
-            
-            game_score = game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, 0)
-            scores['1'] += game_score[0]
-            scores['0'] += game_score[1]
+            scores['0'] = 0
+            scores['1'] = 0
+            pairs = 0
+
+            # 1000 side-swapped pairs, spread over every core
+            for pair_scores in tournament.iter_pairs(bots, 1000, config, score_to_win, enforce_timeout=enforce_timeout, sandbox=sandbox, profile=profile,
+                                                     seed=seed, cache=cache, log=results_log):
+                scores['0'] += pair_scores['0']
+                scores['1'] += pair_scores['1']
+                pairs += 1
+
+                if pairs % print_every == 0:
+                    print(scores)
+            print(scores)
+        if cache is not None:
+            cache.close()
+        if profile_bots:
+            print(profile.report())
+    else:
+        names = [profiler.bot_name(paddles[0].move_getter), profiler.bot_name(paddles[1].move_getter)]
+        if sandbox:
+            time_limit = timeout if enforce_timeout else None
+            paddles[0].move_getter = bot_sandbox.SandboxBot(paddles[0].move_getter, time_limit)
+            paddles[1].move_getter = bot_sandbox.SandboxBot(paddles[1].move_getter, time_limit)
+        elif enforce_timeout:
+            # threaded: the game keeps running even if a bot gets stuck
+            paddles[0].move_getter = pong_engine.DeadlineBot(paddles[0].move_getter, timeout, threaded=True)
+            paddles[1].move_getter = pong_engine.DeadlineBot(paddles[1].move_getter, timeout, threaded=True)
+        wrappers = [paddles[0].move_getter, paddles[1].move_getter]
+        if profile_bots:
+            profile = new_profile(timeout)
+            paddles[0].move_getter = profile.wrap(paddles[0].move_getter, names[0])
+            paddles[1].move_getter = profile.wrap(paddles[1].move_getter, names[1])
+        screen = pygame.display.set_mode(table_size)
+        pygame.display.set_caption('PongAIvAI')
+
+        with profile.instrumented() if profile_bots else contextlib.nullcontext():
+            game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, 1, render_fps)
             ball = Ball(table_size, ball_size, paddle_bounce, wall_bounce, dust_error, init_speed_mag)
+            screen.blit(text_surface('SWITCHING SIDES', 32), [int(0.6*table_size[0])-8, 0])
 
             pygame.display.flip()
-            clock.tick()
+            clock.tick(4)
 
             paddles[0].move_getter, paddles[1].move_getter = paddles[1].move_getter, paddles[0].move_getter
 
-            print(scores)
-    else: 
-        
-        game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, 1)
-        ball = Ball(table_size, ball_size, paddle_bounce, wall_bounce, dust_error, init_speed_mag)
-        screen.blit(pygame.font.Font(None, 32).render(str('SWITCHING SIDES'), True, white), [int(0.6*table_size[0])-8, 0])
-        
-        pygame.display.flip()
-        clock.tick(4)
-        
-        paddles[0].move_getter, paddles[1].move_getter = paddles[1].move_getter, paddles[0].move_getter
-        
-        game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, 1)
+            game_loop(screen, paddles, ball, table_size, clock_rate, turn_wait_rate, score_to_win, 1, render_fps)
+        if sandbox or enforce_timeout:
+            wrappers[0].close()
+            wrappers[1].close()
+        if profile_bots:
+            print(profile.report())
     
     
     
@@ -0,0 +1,323 @@
+'''
+Vectorized PongAIvAI engine: steps N independent matches in lockstep with NumPy.
+
+Every piece of per-match state (ball position and velocity, paddle positions, scores, frame counters) is stored
+as an array with one row per match, and the rules of pong_engine.Ball.move / check_point are applied as array
+operations, with int(|speed|) sub-steps per frame like pong_engine.step without swept. Both engines resolve
+collisions in closed form, but this one uses simpler rules that vectorize well: a ball in a wall is mirrored about
+it, and the time of impact on a paddle only comes from how far the ball went past the paddle's face, while
+pong_engine.Ball.move finds the exact point of contact (also on the top and bottom of a paddle, and never further
+back than a wall). Random numbers come from one NumPy generator for the whole batch. Individual trajectories therefore
+differ slightly from the scalar engine, but the game statistics are the same.
+
+A bot for this engine is a "batch policy": a function called once per frame per side as
+
+    policy(paddle_pos, other_paddle_pos, ball_pos, paddle_size, ball_size, table_size)
+
+where the *_pos arguments are (N, 2) arrays of top-left corners (the same coordinates the scalar bots get through
+fRect.pos) and the sizes are shared (x, y) tuples. It returns an int array of N directions: UP, DOWN or STAY.
+
+Bots that keep state between frames are "batch bots" instead: objects with decide(...), taking the same arguments as
+a batch policy, and reset(mask), called with the mask of slots where a new match is about to start. Examples are
+chaser_ai.batch_pong_ai (a policy), pong_ai.BatchPongAI (a batch bot) and ScalarBots, which runs any scalar bot
+(see pong_engine.py) in every slot.
+'''
+
+import copy
+import math
+
+import numpy as np
+
+import pong_engine
+
+
+UP = -1
+STAY = 0
+DOWN = 1
+
+
+class BatchFunctionBot:
+    '''
+    Adapter that gives a batch policy function the batch bot interface
+    '''
+    __slots__ = ('decide',)
+
+    def __init__(self, policy):
+        self.decide = policy
+
+    def reset(self, mask):
+        pass
+
+
+def as_batch_bot(policy):
+    '''
+    The batch bot interface of policy: batch bots are used as they are, functions are wrapped in a BatchFunctionBot
+    '''
+    if hasattr(policy, 'decide'):
+        return policy
+    return BatchFunctionBot(policy)
+
+
+class ScalarBots:
+    '''
+    Batch bot that plays a scalar bot (a bot object or a move_getter function, see pong_engine.py) in every slot.
+    Each slot gets its own copy of the bot when its match starts. This makes one Python call per match per frame, so
+    it is only meant for bots that have no batched version, or for checking one against its scalar original.
+    '''
+    def __init__(self, bot):
+        self.bot = bot
+        self.bots = []
+
+    def reset(self, mask):
+        if len(self.bots) != len(mask):
+            self.bots = [None]*len(mask)
+        for i in np.flatnonzero(mask):
+            self.bots[i] = pong_engine.as_bot(copy.deepcopy(self.bot))
+            self.bots[i].reset()
+
+    def decide(self, paddle_pos, other_paddle_pos, ball_pos, paddle_size, ball_size, table_size):
+        directions = np.zeros(len(paddle_pos), dtype=np.int64)
+        table_size = tuple(table_size)
+        for i, (own, other, ball) in enumerate(zip(paddle_pos.tolist(), other_paddle_pos.tolist(), ball_pos.tolist())):
+            direction = self.bots[i].decide(pong_engine.fRect(own, paddle_size), pong_engine.fRect(other, paddle_size),
+                                            pong_engine.fRect(ball, ball_size), table_size)
+            if direction == "up":
+                directions[i] = UP
+            elif direction == "down":
+                directions[i] = DOWN
+        return directions
+
+
+class BatchEngine:
+    def __init__(self, n, table_size=(440, 280), paddle_size=(10, 70), ball_size=(15, 15), paddle_speed=1,
+                 max_angle=45, paddle_bounce=1.2, wall_bounce=1.00, dust_error=0.00, init_speed_mag=2,
+                 score_to_win=1, seed=None):
+        self.n = n
+        self.table_size = tuple(table_size)
+        self.paddle_size = tuple(paddle_size)
+        self.ball_size = tuple(ball_size)
+        self.paddle_speed = paddle_speed
+        self.max_angle = max_angle
+        self.paddle_bounce = paddle_bounce
+        self.wall_bounce = wall_bounce
+        self.dust_error = dust_error
+        self.init_speed_mag = init_speed_mag
+        self.score_to_win = score_to_win
+        self.rng = np.random.default_rng(seed)
+
+        # left paddle faces right (facing = 1), right paddle faces left (facing = 0), as in init_game
+        self.paddle_x = np.array([20 - paddle_size[0]/2, table_size[0] - 20 - paddle_size[0]/2])
+        self.facing = np.array([1, 0])
+
+        self.ball_pos = np.zeros((n, 2))
+        self.ball_vel = np.zeros((n, 2))
+        self.paddle_y = np.zeros((n, 2))
+        self.prev_bounce = np.full(n, -1)  # index of the paddle that last hit the ball, -1 for none
+        self.score = np.zeros((n, 2), dtype=np.int64)
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.active = np.zeros(n, dtype=bool)
+
+    def serve(self, mask):
+        '''
+        Put a fresh ball in the middle of the table for every match in mask, like pong_engine.Ball.__init__
+        '''
+        k = int(np.count_nonzero(mask))
+        if not k:
+            return
+        u = self.rng.random((k, 2))
+        rand_ang = (.4 + .4*u[:, 0])*math.pi*(1 - 2*(u[:, 1] > .5)) + .5*math.pi
+        self.ball_vel[mask] = self.init_speed_mag*np.stack([np.cos(rand_ang), np.sin(rand_ang)], axis=1)
+        self.ball_pos[mask] = (self.table_size[0]/2 - self.ball_size[0]/2, self.table_size[1]/2 - self.ball_size[1]/2)
+        self.prev_bounce[mask] = -1
+
+    def new_match(self, mask):
+        '''
+        Start a new match (paddles centred, score 0:0, new serve) in every slot in mask
+        '''
+        self.paddle_y[mask] = self.table_size[1]/2 - self.paddle_size[1]/2
+        self.score[mask] = 0
+        self.frames[mask] = 0
+        self.active[mask] = True
+        self.serve(mask)
+
+    def retire(self, mask):
+        '''
+        Mask finished matches out: a motionless ball in the middle of the table never collides with anything
+        '''
+        self.active[mask] = False
+        self.ball_vel[mask] = 0
+        self.ball_pos[mask] = (self.table_size[0]/2 - self.ball_size[0]/2, self.table_size[1]/2 - self.ball_size[1]/2)
+
+    def paddle_pos(self, side):
+        return np.stack([np.full(self.n, self.paddle_x[side]), self.paddle_y[:, side]], axis=1)
+
+    def check_point(self):
+        '''
+        Vectorized pong_engine.check_point: award points for balls that left the table and serve again.
+        Returns the mask of matches that are now over.
+        '''
+        centre_x = self.ball_pos[:, 0] + self.ball_size[0]/2
+        right_scores = self.active & (centre_x < 0)
+        left_scores = self.active & (centre_x >= self.table_size[0])
+        self.score[right_scores, 1] += 1
+        self.score[left_scores, 0] += 1
+        self.serve(right_scores | left_scores)
+        return self.active & (self.score.max(axis=1) >= self.score_to_win)
+
+    def move_paddles(self, directions):
+        self.paddle_y += np.where(self.active[:, None], directions, 0)*self.paddle_speed
+        np.clip(self.paddle_y, 0, self.table_size[1] - self.paddle_size[1], out=self.paddle_y)
+
+    def bounce_off_walls(self, mask):
+        '''
+        Reflect the balls in mask that overlap the top or bottom wall. Uses the same truncated-integer overlap
+        test as the scalar engine and mirrors the ball about the wall it went into.
+        '''
+        y = self.ball_pos[:, 1]
+        bottom = self.table_size[1] - self.ball_size[1]
+        top_hit = mask & (np.trunc(y) < 0)
+        bottom_hit = mask & (np.trunc(y) > bottom)
+        hit = top_hit | bottom_hit
+        if not hit.any():
+            return hit
+        self.ball_pos[top_hit, 1] = -y[top_hit]
+        self.ball_pos[bottom_hit, 1] = 2*bottom - y[bottom_hit]
+
+        k = int(np.count_nonzero(hit))
+        r = 1 + 2*(self.rng.random((k, 2)) - .5)*self.dust_error
+        self.ball_vel[hit, 0] *= self.wall_bounce*r[:, 0]
+        self.ball_vel[hit, 1] *= -self.wall_bounce*r[:, 1]
+        return hit
+
+    def bounce_off_paddle(self, side, mask, move_factor):
+        '''
+        Reflect the balls in mask that overlap paddle `side`, with the rotate/flip/rotate rule of
+        pong_engine.Ball.move. The time of impact is found analytically from how deep the ball went past the
+        paddle's face, and the ball travels the same time back out with its new velocity.
+        '''
+        bx, by = self.ball_pos[:, 0], self.ball_pos[:, 1]
+        px = self.paddle_x[side]
+        py = self.paddle_y[:, side]
+        pw, ph = self.paddle_size
+        bw, bh = self.ball_size
+        facing = self.facing[side]
+
+        overlap = mask & (bx < px + pw) & (px < bx + bw) & (by < py + ph) & (py < by + bh)
+        centre_x = bx + bw/2
+        if facing == 1:
+            overlap &= centre_x >= px + pw/2
+        else:
+            overlap &= centre_x <= px + pw/2
+        if not overlap.any():
+            return overlap
+
+        v = self.ball_vel[overlap]
+        mf = move_factor[overlap]
+        # depth of the ball past the paddle face, in units of this sub-step's horizontal travel
+        depth = (px + pw - bx[overlap]) if facing == 1 else (bx[overlap] + bw - px)
+        travel = np.abs(v[:, 0])*mf
+        back = np.minimum(np.divide(depth, travel, out=np.ones_like(depth), where=travel > 0), 1)
+        pos = self.ball_pos[overlap] - v*(mf*back)[:, None]
+
+        rel_dist_from_c = np.clip((pos[:, 1] + bh/2 - (py[overlap] + ph/2))/ph, -.5, .5)
+        theta = (1 - 2*facing)*rel_dist_from_c*self.max_angle*math.pi/180
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+        vx = -(cos_t*v[:, 0] - sin_t*v[:, 1])
+        vy = sin_t*v[:, 0] + cos_t*v[:, 1]
+        vx, vy = cos_t*vx + sin_t*vy, cos_t*vy - sin_t*vx
+
+        # Bona fide hack from the scalar engine: enforce a lower bound on horizontal speed
+        out = 2*facing - 1
+        slow = vx*out < 1
+        vy = np.where(slow, np.sign(vy)*np.sqrt(np.maximum(vx**2 + vy**2 - 1, 0)), vy)
+        vx = np.where(slow, out, vx)
+
+        accelerate = np.where(self.prev_bounce[overlap] != side, self.paddle_bounce, 1.)
+        v = np.stack([vx*accelerate, vy*accelerate], axis=1)
+        self.prev_bounce[overlap] = side
+
+        pos += v*(mf*back)[:, None]
+        # make sure a slow return still leaves the paddle
+        if facing == 1:
+            pos[:, 0] = np.maximum(pos[:, 0], px + pw)
+        else:
+            pos[:, 0] = np.minimum(pos[:, 0], px - bw)
+        self.ball_pos[overlap] = pos
+        self.ball_vel[overlap] = v
+        return overlap
+
+    def move_ball(self):
+        '''
+        Vectorized frame of ball movement: int(|speed|) sub-steps per match, run in lockstep
+        '''
+        speed = np.sqrt((self.ball_vel**2).sum(axis=1))
+        sub_steps = speed.astype(np.int64)
+        move_factor = 1./np.maximum(sub_steps, 1)
+        sub_steps = np.maximum(sub_steps, 1)
+        for i in range(int(sub_steps[self.active].max(initial=1))):
+            stepping = self.active & (sub_steps > i)
+            moved = self.bounce_off_walls(stepping)
+            moved |= self.bounce_off_paddle(0, stepping, move_factor)
+            moved |= self.bounce_off_paddle(1, stepping, move_factor)
+            free = stepping & ~moved
+            self.ball_pos[free] += self.ball_vel[free]*move_factor[free, None]
+
+    def step(self, directions):
+        '''
+        One frame for every match: (N, 2) array of paddle directions in, like pong_engine.step
+        '''
+        self.move_paddles(directions)
+        self.move_ball()
+        self.frames += self.active
+
+    def directions(self, left_bot, right_bot):
+        '''
+        (N, 2) array of the directions two batch bots choose for this frame
+        '''
+        left, right = self.paddle_pos(0), self.paddle_pos(1)
+        args = (self.paddle_size, self.ball_size, self.table_size)
+        return np.stack([left_bot.decide(left, right, self.ball_pos, *args),
+                         right_bot.decide(right, left, self.ball_pos, *args)], axis=1)
+
+    def play(self, n_matches, left_policy, right_policy):
+        '''
+        Play n_matches matches, keeping every slot busy by refilling it as soon as its match is over.
+        The players are batch policies or batch bots. Returns the (n_matches, 2) final scores and the number of frames
+        each match took.
+        '''
+        bots = (as_batch_bot(left_policy), as_batch_bot(right_policy))
+        scores = np.zeros((n_matches, 2), dtype=np.int64)
+        frames = np.zeros(n_matches, dtype=np.int64)
+        match_index = np.full(self.n, -1)
+
+        self.retire(np.ones(self.n, dtype=bool))
+        started = min(self.n, n_matches)
+        first = np.arange(self.n) < started
+        match_index[first] = np.arange(started)
+        self.new_match(first)
+        for bot in bots:
+            bot.reset(np.ones(self.n, dtype=bool))
+
+        finished = 0
+        while finished < n_matches:
+            done = self.check_point()
+            if done.any():
+                scores[match_index[done]] = self.score[done]
+                frames[match_index[done]] = self.frames[done]
+                finished += int(np.count_nonzero(done))
+
+                refill = np.flatnonzero(done)[:max(0, n_matches - started)]
+                self.retire(done)
+                if len(refill):
+                    match_index[refill] = np.arange(started, started + len(refill))
+                    started += len(refill)
+                    refill_mask = np.zeros(self.n, dtype=bool)
+                    refill_mask[refill] = True
+                    self.new_match(refill_mask)
+                    for bot in bots:
+                        bot.reset(refill_mask)
+                if finished >= n_matches:
+                    break
+            self.step(self.directions(*bots))
+
+        return scores, frames
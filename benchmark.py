@@ -0,0 +1,274 @@
+'''
+Benchmarks of the engine and bot hot paths.
+
+Every benchmark sets up its own fixed, seeded situation, so two runs on the same machine measure the same work:
+
+    ball_move/...        one Ball.move sub-step in free flight, into a wall and into a paddle
+    game_loop/...        one headless frame between two chaser bots, with sub-steps and swept
+    rally/hits=N/...     one frame after N paddle hits, when the ball is 1.2**N times faster than at the serve
+    landing_spot/...     pong_ai_new.calculate_landing_spot, straight and with several wall bounces
+    ball_target/width=N  pong_ai_new.calculate_ball_target with N pixels of reachable paddle positions, with and
+                         without the trajectory's reflections cached
+    decision/...         every decision of a recorded match, replayed through a fresh bot with a cold cache
+
+Each benchmark is repeated and the fastest repeat is reported, in nanoseconds per operation. Results can be written
+to a JSON file and compared with an earlier one:
+
+    python benchmark.py --output baseline.json
+    ... change something ...
+    python benchmark.py --compare baseline.json
+
+The comparison lists the change of every benchmark and exits with status 1 if any of them got slower by more than
+--threshold (10% by default), so it can be used as a gate.
+Timings on a busy or shared machine easily move by more than that, so compare runs made on the same, otherwise
+idle machine.
+'''
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import chaser_ai
+import pong_ai
+import pong_ai_new
+import pong_engine
+import tournament
+
+
+SEED = 2022
+CONFIG = tournament.DEFAULT_CONFIG
+TABLE_SIZE = CONFIG['table_size']
+RALLY_HITS = (0, 2, 4, 6, 8)
+TARGET_WIDTHS = (4, 16, 64, 85)
+
+
+def new_match(left_bot=chaser_ai.pong_ai, right_bot=chaser_ai.pong_ai):
+    paddles, ball = pong_engine.new_match(**CONFIG, rng=random.Random(SEED))
+    paddles[0].move_getter = left_bot
+    paddles[1].move_getter = right_bot
+    for paddle in paddles:
+        paddle.bot.reset()
+    return paddles, ball
+
+
+def place_ball(ball, pos, speed):
+    ball.frect.pos[0], ball.frect.pos[1] = pos
+    ball.speed = speed
+    ball.prev_bounce = None
+
+
+def bench_ball_move(pos, speed):
+    paddles, ball = new_match()
+
+    def op():
+        place_ball(ball, pos, speed)
+        ball.move(paddles, TABLE_SIZE, 1)
+    return op, 1
+
+
+def bench_frames(swept, hits=None):
+    '''
+    One frame per operation. With hits, the ball is put back at the same place with 1.2**hits times the serve speed
+    every frame; without, the match just goes on
+    '''
+    paddles, ball = new_match()
+    score = [0, 0]
+    if hits is None:
+        def op():
+            pong_engine.check_point(score, ball, TABLE_SIZE)
+            pong_engine.step(paddles, ball, TABLE_SIZE, swept)
+        return op, 1
+
+    speed = CONFIG['init_speed_mag']*CONFIG['paddle_bounce']**hits
+    velocity = (speed*0.8, speed*0.6)
+    pos = (TABLE_SIZE[0]/2, TABLE_SIZE[1]/2)
+
+    def op():
+        place_ball(ball, pos, velocity)
+        pong_engine.step(paddles, ball, TABLE_SIZE, swept)
+    return op, 1
+
+
+def bench_landing_spot(y_velocity):
+    def op():
+        pong_ai_new.calculate_landing_spot(220, 140, 407.5, 2.3, y_velocity, TABLE_SIZE[1], CONFIG['ball_size'][0])
+    return op, 1
+
+
+def bench_ball_target(width, cold):
+    '''
+    The ball comes in straight at y=140 with the paddle waiting there, and arrives in width/2 frames, so the paddle
+    can reach width pixels of positions (the whole paddle height plus ball once width is 85). Cold starts without a
+    cached plan, warm only has the reflections of the trajectory cached (as from the frame the ball last bounced)
+    '''
+    x_velocity = -3
+    frames = width/2
+    start_x = 32.5 - frames*x_velocity
+    paddle_height = CONFIG['paddle_size'][1]
+
+    def op():
+        if cold:
+            pong_ai_new.plan_cache.clear()
+        else:
+            for plan in pong_ai_new.plan_cache.values():
+                plan["returns"].clear()
+                plan["segments"].clear()
+        pong_ai_new.calculate_ball_target(start_x, 140, x_velocity, 0.7, 32.5, 407.5, 140, paddle_height, TABLE_SIZE[1], CONFIG['ball_size'][0])
+    return op, 1
+
+
+def record_states(n_frames=3000):
+    '''
+    The left bot's view of the first n_frames frames of a seeded pong_ai_new vs pong_ai match
+    '''
+    paddles, ball = new_match(pong_ai_new.PongAI(), pong_ai.PongAI())
+    score = [0, 0]
+    states = []
+    for _ in range(n_frames):
+        states.append((paddles[0].frect.copy(), paddles[1].frect.copy(), ball.frect.copy()))
+        pong_engine.check_point(score, ball, TABLE_SIZE)
+        pong_engine.step(paddles, ball, TABLE_SIZE)
+    return states
+
+
+def bench_decisions(bot_class, module, states):
+    def op():
+        module.plan_cache.clear()
+        bot = bot_class()
+        for paddle_frect, other_paddle_frect, ball_frect in states:
+            bot.decide(paddle_frect, other_paddle_frect, ball_frect, TABLE_SIZE)
+    return op, len(states)
+
+
+def benchmarks():
+    '''
+    (name, setup) of every benchmark, where setup() returns (operation, number of operations per call)
+    '''
+    states = []
+
+    def decisions(bot_class, module):
+        def setup():
+            if not states:
+                states.extend(record_states())
+            return bench_decisions(bot_class, module, states)
+        return setup
+
+    cases = [
+        ('ball_move/free', lambda: bench_ball_move((200, 100), (2.0, 0.5))),
+        ('ball_move/wall', lambda: bench_ball_move((200, -1.2), (2.0, -2.0))),
+        ('ball_move/paddle', lambda: bench_ball_move((20, 130), (-3.0, 0.5))),
+        ('game_loop/substeps', lambda: bench_frames(False)),
+        ('game_loop/swept', lambda: bench_frames(True)),
+    ]
+    for hits in RALLY_HITS:
+        cases.append(('rally/hits=%d/substeps' % hits, lambda hits=hits: bench_frames(False, hits)))
+        cases.append(('rally/hits=%d/swept' % hits, lambda hits=hits: bench_frames(True, hits)))
+    cases += [
+        ('landing_spot/straight', lambda: bench_landing_spot(0.7)),
+        ('landing_spot/bounces', lambda: bench_landing_spot(9.1)),
+    ]
+    for width in TARGET_WIDTHS:
+        cases.append(('ball_target/width=%d/cold' % width, lambda width=width: bench_ball_target(width, True)))
+        cases.append(('ball_target/width=%d/warm' % width, lambda width=width: bench_ball_target(width, False)))
+    cases += [
+        ('decision/pong_ai', decisions(pong_ai.PongAI, pong_ai)),
+        ('decision/pong_ai_new', decisions(pong_ai_new.PongAI, pong_ai_new)),
+    ]
+    return cases
+
+
+def measure(op, ops_per_call, min_time, repeats):
+    '''
+    Fastest time per operation over repeats runs of at least min_time seconds each, in nanoseconds
+    '''
+    op()  # warm up (imports, lazily loaded tables)
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls *= 2 if elapsed <= 0 else max(2, min(10, int(min_time/elapsed) + 1))
+
+    best = elapsed
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            op()
+        best = min(best, time.perf_counter() - start)
+    return best/(calls*ops_per_call)*1e9
+
+
+def run(name_filter=None, min_time=0.02, repeats=25, out=sys.stdout):
+    results = {}
+    for name, setup in benchmarks():
+        if name_filter and name_filter not in name:
+            continue
+        op, ops_per_call = setup()
+        ns = measure(op, ops_per_call, min_time, repeats)
+        results[name] = {'ns_per_op': ns, 'ops_per_sec': 1e9/ns}
+        print('%-30s %12.0f ns %14.0f /s' % (name, ns, 1e9/ns), file=out)
+    return {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(), 'platform': platform.platform(),
+                 'seed': SEED, 'min_time': min_time, 'repeats': repeats,
+                 'date': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold, out=sys.stdout):
+    '''
+    Print the change of every benchmark in both runs and return the names of those that are more than threshold
+    (a fraction) slower
+    '''
+    slower = []
+    print('%-30s %12s %12s %8s' % ('', 'baseline', 'now', 'change'), file=out)
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before, now = baseline['results'][name]['ns_per_op'], result['ns_per_op']
+        change = now/before - 1
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            slower.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print('%-30s %9.0f ns %9.0f ns %+7.1f%%%s' % (name, before, now, 100*change, flag), file=out)
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the PongAIvAI engine and bots')
+    parser.add_argument('-k', '--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('-c', '--compare', help='compare with the results in this JSON file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10, help='slowdown that fails the comparison (default 0.10)')
+    parser.add_argument('--quick', action='store_true', help='shorter runs, less precise')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        results = run(args.filter, repeats=7)
+    else:
+        results = run(args.filter)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        slower = compare(baseline, results, args.threshold)
+        if slower:
+            print('\n%d benchmark(s) more than %g%% slower: %s' % (len(slower), 100*args.threshold, ', '.join(slower)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+'''
+Out-of-process bots for PongAIvAI.
+
+SandboxBot runs a bot in a child process of its own, so a bot that crashes (or calls sys.exit, or runs out of memory)
+only loses its own moves, and with a time limit a bot that gets stuck cannot stall the game either.
+
+The game and the bot process talk through one small block of shared memory with a fixed layout: a request slot with
+the three rectangles and table_size as plain numbers, and a response slot with the direction. Nothing is pickled per
+frame; a pair of semaphores only says "there is a request" and "there is an answer". Every request carries a sequence
+number that the answer repeats, so a late answer is never mistaken for the answer to a later frame.
+
+The bot process rebuilds the rectangles as read-only views (see pong_engine.FrozenRect), so bots see the same
+interface as in-process. Sizes arrive as floats, table_size as ints.
+
+Bot processes are children of the process that creates the SandboxBot, which must therefore not be a daemonic process
+(e.g. a multiprocessing.Pool worker). tournament.py uses a ProcessPoolExecutor for sandboxed tournaments for this
+reason.
+'''
+
+import logging
+import multiprocessing
+import struct
+import traceback
+from multiprocessing import shared_memory
+
+import pong_engine
+
+
+log = logging.getLogger(__name__)
+
+
+# sequence number, command, then the bot's paddle, the other paddle and the ball as (x, y, width, height), table_size
+REQUEST = struct.Struct('<QI4x12d2q')
+# sequence number of the request that is answered, result
+RESPONSE = struct.Struct('<QI4x')
+DECIDE, RESET, STOP = 0, 1, 2
+NO_MOVE, UP, DOWN, ERROR = 0, 1, 2, 3
+RESULTS = {'up': UP, 'down': DOWN}
+DIRECTIONS = (None, 'up', 'down')
+EMPTY_STATE = (0.0,)*12 + (0, 0)
+# how often a caller that waits without a time limit checks whether the bot process is still alive, in seconds
+LIVENESS_INTERVAL = 1
+
+
+def _serve(shm, bot, requests, responses):
+    '''
+    Main loop of the bot process: answer requests until told to stop. Only the first exception the bot raises is
+    printed, the game counts the others (see SandboxBot)
+    '''
+    buf = shm.buf
+    raised = False
+    frects = [pong_engine.fRect((0, 0), (0, 0)) for _ in range(3)]
+    views = [pong_engine.FrozenRect(frect) for frect in frects]
+    while True:
+        requests.acquire()
+        request = REQUEST.unpack_from(buf, 0)
+        sequence, command = request[0], request[1]
+        if command == STOP:
+            return
+
+        result = NO_MOVE
+        try:
+            if command == RESET:
+                bot.reset()
+            else:
+                for i in range(3):
+                    frect = frects[i]
+                    frect.pos[0], frect.pos[1] = request[2 + 4*i], request[3 + 4*i]
+                    size = (request[4 + 4*i], request[5 + 4*i])
+                    if size != frect.size:
+                        # FrozenRect keeps the size tuple it was made with
+                        frect.size = size
+                        views[i] = pong_engine.FrozenRect(frect)
+                    else:
+                        views[i].update(frect)
+                direction = bot.decide(views[0], views[1], views[2], (request[14], request[15]))
+                result = RESULTS.get(direction, NO_MOVE) if isinstance(direction, str) else NO_MOVE
+        except Exception:
+            if not raised:
+                traceback.print_exc()
+                raised = True
+            result = ERROR
+        RESPONSE.pack_into(buf, REQUEST.size, sequence, result)
+        responses.release()
+
+
+class SandboxBot:
+    '''
+    Bot wrapper that runs the bot in its own process. A move the bot does not answer within time_limit seconds (None:
+    no limit), or that raises an exception, is dropped ("no move", None) and counted in overruns or errors. While the
+    bot is still busy with a late move, the following frames get None straight away, and if the bot process dies,
+    every move from then on is None.
+
+    The bot is handed to the bot process when the SandboxBot is created (pickled, unless processes are forked), so the
+    game never sees its state. Call close() to stop the process.
+    '''
+    def __init__(self, bot, time_limit=None):
+        self.name = repr(bot)
+        self.time_limit = time_limit
+        self.calls = 0
+        self.overruns = 0
+        self.errors = 0
+        self.sequence = 0
+        self.answered = 0
+        self.dead = False
+        self.shm = shared_memory.SharedMemory(create=True, size=REQUEST.size + RESPONSE.size)
+        self.requests = multiprocessing.Semaphore(0)
+        self.responses = multiprocessing.Semaphore(0)
+        self.process = multiprocessing.Process(target=_serve, daemon=True,
+                                               args=(self.shm, pong_engine.as_bot(bot), self.requests, self.responses))
+        self.process.start()
+
+    def _receive(self, timeout):
+        '''
+        Wait up to timeout seconds (None: as long as the bot process lives) for the answer to the last request and
+        return its result, or None if there is none
+        '''
+        while not self.responses.acquire(timeout=LIVENESS_INTERVAL if timeout is None else timeout):
+            if not self.process.is_alive():
+                if not self.dead:
+                    self.dead = True
+                    log.error('Process of %s exited with code %s', self.name, self.process.exitcode)
+                return None
+            if timeout is not None:
+                return None
+        self.answered, result = RESPONSE.unpack_from(self.shm.buf, REQUEST.size)
+        return result
+
+    def _call(self, command, state, timeout):
+        if self.dead:
+            return None
+        if self.answered < self.sequence and self._receive(0) is None:
+            return None
+        self.sequence += 1
+        REQUEST.pack_into(self.shm.buf, 0, self.sequence, command, *state)
+        self.requests.release()
+        return self._receive(timeout)
+
+    def reset(self):
+        timeout = None if self.time_limit is None else 1
+        if self.answered < self.sequence:
+            # let a late move finish (for at most a second) so it cannot undo the reset
+            self._receive(timeout)
+        self._call(RESET, EMPTY_STATE, timeout)
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        self.calls += 1
+        state = (paddle_frect.pos[0], paddle_frect.pos[1], paddle_frect.size[0], paddle_frect.size[1],
+                 other_paddle_frect.pos[0], other_paddle_frect.pos[1], other_paddle_frect.size[0], other_paddle_frect.size[1],
+                 ball_frect.pos[0], ball_frect.pos[1], ball_frect.size[0], ball_frect.size[1],
+                 int(table_size[0]), int(table_size[1]))
+        result = self._call(DECIDE, state, self.time_limit)
+        if result is None:
+            self.overruns += 1
+            # log the 1st, 2nd, 4th, 8th, ... dropped move, so a slow bot cannot flood the log
+            if self.overruns & (self.overruns - 1) == 0 and not self.dead:
+                log.warning('%s took longer than %gs: %d of %d moves dropped so far', self.name, self.time_limit, self.overruns, self.calls)
+            return None
+        if result == ERROR:
+            self.errors += 1
+            if self.errors & (self.errors - 1) == 0:
+                log.warning('%s raised an exception: %d of %d moves dropped so far', self.name, self.errors, self.calls)
+            return None
+        return DIRECTIONS[result]
+
+    def close(self):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            REQUEST.pack_into(self.shm.buf, 0, self.sequence + 1, STOP, *EMPTY_STATE)
+            self.requests.release()
+            self.process.join(1)
+            if self.process.is_alive():
+                # still stuck in a move
+                self.process.terminate()
+                self.process.join()
+        self.process = None
+        self.shm.close()
+        self.shm.unlink()
@@ -33,3 +33,14 @@ def pong_ai(paddle_frect, other_paddle_frect, ball_frect, table_size):
     else:
      return "up"
     
+
+
+def batch_pong_ai(paddle_pos, other_paddle_pos, ball_pos, paddle_size, ball_size, table_size):
+    '''pong_ai for many matches at once, as a batch policy for batch_engine.py
+
+    Arguments are (N, 2) arrays of top-left corners (paddle_pos, other_paddle_pos,
+    ball_pos) and the shared paddle_size, ball_size and table_size. Returns an
+    array of N directions: 1 for "down", -1 for "up"
+    '''
+    import numpy as np
+    return np.where(paddle_pos[:, 1]+paddle_size[1]/2 < ball_pos[:, 1]+ball_size[1]/2, 1, -1)
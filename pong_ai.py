@@ -1,94 +1,186 @@
+from collections import OrderedDict
+
+# This file is a whole bot on its own, as ESC180 contest entries had to be, so it shares no code with pong_ai_new.py:
+# calculate_landing_spot, calculate_landing_spots, calculate_returns and get_trajectory_plan are copied between the two
+# files (pong_ai_new.py's get_trajectory_plan also keeps segments). A shared helper module would also escape
+# results_cache, which only fingerprints the module that defines a bot. Change a copied helper in both files.
+
+# Plans for recently seen ball trajectories, least recently used first (see get_trajectory_plan)
+plan_cache = OrderedDict()
+PLAN_CACHE_SIZE = 256
+
+
+class PongAI:
+    """
+    Andy Gong's pong AI as a bot object (see pong_engine.py): every instance keeps its own velocity estimate, so any
+    number of them can play at the same time in one process
+    """
+    # Requirement of team name
+    team_name = "Andy Gong"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the ball's previous position, called before every match
+        """
+        # Memorize previous position to calculate velocity
+        self.previous_position = [0, 0]
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        """
+        Determine where the paddle should move to, given relevant information of the board
+        All objects are rectangles with positions referencing the top left corner.
+            0             x
+            |------------->
+            |
+            |
+            |
+        y   v
+        :param paddle_frect: paddle_frect.pos = [x, y], paddle_frect.size = [x_size, y_size]
+        :param other_paddle_frect: other_paddle_frect.pos = [x, y], other_paddle_frect.size = [x_size, y_size]
+        :param ball_frect: ball_frect.pos = [x, y], ball_frect.size = [x_size, y_size]
+        :param table_size: [x_size, y_size]
+        :return: "up" or "down"
+        """
+        # Gather ball information: centre position and velocity.
+        ball_diameter = ball_frect.size[0]
+        ball_centre = [ball_frect.pos[0]+ball_diameter/2, ball_frect.pos[1]+ball_diameter/2]
+        ball_velocity = [ball_centre[0]-self.previous_position[0], ball_centre[1]-self.previous_position[1]]
+        self.previous_position = ball_centre[:]  # Update previous_position
+
+        # Determine at what x-coordinate will the ball's centre be when it hits the paddle
+        # Note:
+        #     consider both possible location of the paddle (left and right)
+        #     for impact x-pos, consider the ball's own radius affecting impact position
+        paddle_hit_x_pos = paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] > other_paddle_frect.pos[0] else paddle_frect.pos[0] + paddle_frect.size[0] + ball_diameter/2
+        enemy_paddle_hit_x_pos = other_paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] < other_paddle_frect.pos[0] else other_paddle_frect.pos[0] + other_paddle_frect.size[0] + ball_diameter/2
+        nearest_wall_x = 0 if paddle_hit_x_pos < enemy_paddle_hit_x_pos else table_size[0]
+
+        # y-coordinate for both paddles (current state)
+        enemy_paddle_max_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]
+        enemy_paddle_min_y = other_paddle_frect.pos[1]
+        paddle_centre_y = paddle_frect.pos[1] + paddle_frect.size[1]/2
+        enemy_paddle_centre_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]/2
+
+        # if ball approaching, note here approaching originally used paddle_hit_x_pos, now uses paddle_nearest_wall
+        # This was done because sometimes the paddle thought the ball passed the paddle and decided to go back to middle...
+        if ball_velocity[0] * (nearest_wall_x - ball_centre[0]) >= 0:
+            # If the ball is approaching, find how the ball will contact paddle (y-coordinate and velocity)
+            ball_return_landing_spots_and_speed = calculate_ball_target(ball_centre[0], ball_centre[1],
+                              ball_velocity[0], ball_velocity[1],
+                              paddle_hit_x_pos, enemy_paddle_hit_x_pos,
+                              paddle_centre_y,
+                              paddle_frect.size[1],
+                              table_size[1], ball_diameter)
+
+            # Given the landing position and velocity, find the way of hitting that ensures best chance of winning
+            best_return_score = -1
+            best_hitting_position_for_paddle_centre = -1
+            for (return_y_pos, return_x_velocity), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
+                if enemy_paddle_min_y <= return_y_pos <= enemy_paddle_max_y:
+                    return_y_dist = 0
+                else:
+                    return_y_dist = min(abs(return_y_pos-enemy_paddle_max_y), abs(return_y_pos-enemy_paddle_min_y))
+                if best_return_score < abs(return_y_dist * return_x_velocity):
+                    best_return_score = abs(return_y_dist * return_x_velocity)
+                    best_hitting_position_for_paddle_centre = centre_hitting_pos
+
+            if paddle_centre_y < best_hitting_position_for_paddle_centre:
+                return "down"
+            return "up"
+
+        # ball is leaving
+        else:
+            # If ball is leaving, find how it may be hit back and move to average location
+            ball_return_landing_spots_and_speed = calculate_ball_target(ball_centre[0], ball_centre[1],
+                                                                        ball_velocity[0], ball_velocity[1],
+                                                                        enemy_paddle_hit_x_pos, paddle_hit_x_pos,
+                                                                        enemy_paddle_centre_y,
+                                                                        other_paddle_frect.size[1],
+                                                                        table_size[1], ball_diameter)
+            sum_x_velocity = 0
+            sum_velocity_and_position_product = 0
+            for (return_y_pos, return_x_velocity), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
+                sum_x_velocity += return_x_velocity
+                sum_velocity_and_position_product += return_x_velocity * return_y_pos
+            if sum_x_velocity == 0:
+                average_interception_point = sum_velocity_and_position_product
+            else:
+                average_interception_point = sum_velocity_and_position_product / sum_x_velocity
+            if paddle_centre_y < average_interception_point:
+                return "down"
+            return "up"
+
+
+# The bot behind the pong_ai function. All callers of the function share it, so use PongAI instances to play more than one game at a time
+legacy_bot = PongAI()
+
+
 def pong_ai(paddle_frect, other_paddle_frect, ball_frect, table_size):
     """
-    Determine where the paddle should move to, given relevant information of the board
-    All objects are rectangles with positions referencing the top left corner.
-        0             x
-        |------------->
-        |
-        |
-        |
-    y   v
-    :param paddle_frect: paddle_frect.pos = [x, y], paddle_frect.size = [x_size, y_size]
-    :param other_paddle_frect: other_paddle_frect.pos = [x, y], other_paddle_frect.size = [x_size, y_size]
-    :param ball_frect: ball_frect.pos = [x, y], ball_frect.size = [x_size, y_size]
-    :param table_size: [x_size, y_size]
+    The original move_getter interface of the AI, see PongAI.decide
+    Every caller plays with legacy_bot, which is never reset
     :return: "up" or "down"
     """
-    # Memorize previous position to calculate velocity
-    if "previous_position" not in dir(pong_ai):
-        pong_ai.previous_position = [0, 0]
-
     # Requirement of team name
-    pong_ai.team_name = "Andy Gong"
-
-    # Gather ball information: centre position and velocity.
-    ball_diameter = ball_frect.size[0]
-    ball_centre = [ball_frect.pos[0]+ball_diameter/2, ball_frect.pos[1]+ball_diameter/2]
-    ball_velocity = [ball_centre[0]-pong_ai.previous_position[0], ball_centre[1]-pong_ai.previous_position[1]]
-    pong_ai.previous_position = ball_centre[:]  # Update previous_position
-
-    # Determine at what x-coordinate will the ball's centre be when it hits the paddle
-    # Note:
-    #     consider both possible location of the paddle (left and right)
-    #     for impact x-pos, consider the ball's own radius affecting impact position
-    paddle_hit_x_pos = paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] > other_paddle_frect.pos[0] else paddle_frect.pos[0] + paddle_frect.size[0] + ball_diameter/2
-    enemy_paddle_hit_x_pos = other_paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] < other_paddle_frect.pos[0] else other_paddle_frect.pos[0] + other_paddle_frect.size[0] + ball_diameter/2
-    nearest_wall_x = 0 if paddle_hit_x_pos < enemy_paddle_hit_x_pos else table_size[0]
-
-    # y-coordinate for both paddles (current state)
-    enemy_paddle_max_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]
-    enemy_paddle_min_y = other_paddle_frect.pos[1]
-    paddle_centre_y = paddle_frect.pos[1] + paddle_frect.size[1]/2
-    enemy_paddle_centre_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]/2
-
-    # if ball approaching, note here approaching originally used paddle_hit_x_pos, now uses paddle_nearest_wall
-    # This was done because sometimes the paddle thought the ball passed the paddle and decided to go back to middle...
-    if ball_velocity[0] * (nearest_wall_x - ball_centre[0]) >= 0:
-        # If the ball is approaching, find how the ball will contact paddle (y-coordinate and velocity)
-        ball_return_landing_spots_and_speed = calculate_ball_target(ball_centre[0], ball_centre[1],
-                          ball_velocity[0], ball_velocity[1],
-                          paddle_hit_x_pos, enemy_paddle_hit_x_pos,
-                          paddle_centre_y,
-                          paddle_frect.size[1],
-                          table_size[1], ball_diameter)
-
-        # Given the landing position and velocity, find the way of hitting that ensures best chance of winning
-        best_return_score = -1
-        best_hitting_position_for_paddle_centre = -1
-        for (return_y_pos, return_x_velocity), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
-            if enemy_paddle_min_y <= return_y_pos <= enemy_paddle_max_y:
-                return_y_dist = 0
-            else:
-                return_y_dist = min(abs(return_y_pos-enemy_paddle_max_y), abs(return_y_pos-enemy_paddle_min_y))
-            if best_return_score < abs(return_y_dist * return_x_velocity):
-                best_return_score = abs(return_y_dist * return_x_velocity)
-                best_hitting_position_for_paddle_centre = centre_hitting_pos
+    pong_ai.team_name = PongAI.team_name
+    return legacy_bot.decide(paddle_frect, other_paddle_frect, ball_frect, table_size)
 
-        if paddle_centre_y < best_hitting_position_for_paddle_centre:
-            return "down"
-        return "up"
 
-    # ball is leaving
-    else:
-        # If ball is leaving, find how it may be hit back and move to average location
-        ball_return_landing_spots_and_speed = calculate_ball_target(ball_centre[0], ball_centre[1],
-                                                                    ball_velocity[0], ball_velocity[1],
-                                                                    enemy_paddle_hit_x_pos, paddle_hit_x_pos,
-                                                                    enemy_paddle_centre_y,
-                                                                    other_paddle_frect.size[1],
-                                                                    table_size[1], ball_diameter)
-        sum_x_velocity = 0
-        sum_velocity_and_position_product = 0
-        for (return_y_pos, return_x_velocity), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
-            sum_x_velocity += return_x_velocity
-            sum_velocity_and_position_product += return_x_velocity * return_y_pos
-        if sum_x_velocity == 0:
-            average_interception_point = sum_velocity_and_position_product
-        else:
-            average_interception_point = sum_velocity_and_position_product / sum_x_velocity
-        if paddle_centre_y < average_interception_point:
-            return "down"
-        return "up"
+class BatchPongAI:
+    """
+    The landing prediction of PongAI for many matches at once, as a batch bot for batch_engine.py
+    When the ball approaches, the paddle moves to where calculate_landing_spot says the ball will arrive. It does not choose
+    the angle of its return like PongAI does. When the ball is leaving, it assumes the opponent hits it back with the centre
+    of their paddle (a flat 1.2x reflection) and waits where that return would land
+    """
+    def __init__(self):
+        self.previous_position = None
+
+    def reset(self, mask):
+        """
+        Forget the ball's previous position in every match where mask is True, called before those matches start
+        :param mask: boolean array with one entry per match
+        """
+        import numpy as np
+        if self.previous_position is None or len(self.previous_position) != len(mask):
+            self.previous_position = np.zeros((len(mask), 2))
+        self.previous_position[mask] = 0
+
+    def decide(self, paddle_pos, other_paddle_pos, ball_pos, paddle_size, ball_size, table_size):
+        """
+        Determine where the paddle should move to in every match
+        :param paddle_pos: (N, 2) array of the paddle's top left corners
+        :param other_paddle_pos: (N, 2) array of the other paddle's top left corners
+        :param ball_pos: (N, 2) array of the ball's top left corners
+        :param paddle_size: [x_size, y_size] of both paddles
+        :param ball_size: [x_size, y_size] of the ball
+        :param table_size: [x_size, y_size]
+        :return: array of 1 ("down") or -1 ("up") for every match
+        """
+        import numpy as np
+        ball_diameter = ball_size[0]
+        ball_centre = ball_pos + ball_diameter/2
+        ball_velocity = ball_centre - self.previous_position
+        self.previous_position = ball_centre
+
+        # x-coordinates of the ball's centre when it hits each paddle, as in PongAI.decide
+        paddle_hit_x_pos = np.where(paddle_pos[:, 0] > other_paddle_pos[:, 0], paddle_pos[:, 0] - ball_diameter/2, paddle_pos[:, 0] + paddle_size[0] + ball_diameter/2)
+        enemy_paddle_hit_x_pos = np.where(paddle_pos[:, 0] < other_paddle_pos[:, 0], other_paddle_pos[:, 0] - ball_diameter/2, other_paddle_pos[:, 0] + paddle_size[0] + ball_diameter/2)
+        nearest_wall_x = np.where(paddle_hit_x_pos < enemy_paddle_hit_x_pos, 0, table_size[0])
+        paddle_centre_y = paddle_pos[:, 1] + paddle_size[1]/2
+        approaching = ball_velocity[:, 0] * (nearest_wall_x - ball_centre[:, 0]) >= 0
+
+        # Where the ball reaches our paddle if it is approaching
+        landing_y, _, _ = calculate_landing_spots(ball_centre[:, 0], ball_centre[:, 1], paddle_hit_x_pos, ball_velocity[:, 0], ball_velocity[:, 1], table_size[1], ball_diameter)
+        # Where it reaches the opponent if it is leaving, and where a flat return from there reaches us
+        enemy_landing_y, enemy_x_velocity, enemy_y_velocity = calculate_landing_spots(ball_centre[:, 0], ball_centre[:, 1], enemy_paddle_hit_x_pos, ball_velocity[:, 0], ball_velocity[:, 1], table_size[1], ball_diameter)
+        return_landing_y, _, _ = calculate_landing_spots(enemy_paddle_hit_x_pos, enemy_landing_y, paddle_hit_x_pos, -1.2 * enemy_x_velocity, 1.2 * enemy_y_velocity, table_size[1], ball_diameter)
+
+        target_y = np.where(approaching, landing_y, return_landing_y)
+        return np.where(paddle_centre_y < target_y, 1, -1)
 
 
 def calculate_landing_spot(current_centre_x, current_centre_y, destination_x, x_velocity, y_velocity, table_height, ball_diameter):
@@ -160,9 +252,10 @@ def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velo
     :return: a dictionary of: [(ball's landing spot after being hit by current_paddle, ball's x-velocity after reflecting)): position for centre of paddle to be at to hit this ball]
         If impossible to hit the ball, return [middle of game table: current expected landing spot of ball hitting current_paddle]
     """
-    import math
     # Determine how will the ball approach CURRENT PADDLE
     y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity = calculate_landing_spot(current_centre_x, current_centre_y, current_paddle_hit_x_pos, x_velocity, y_velocity, table_height, ball_diameter)
+    plan = get_trajectory_plan(y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity, current_paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter)
+    y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity = plan["trajectory"]
 
     # Find time remaining until ball hits current paddle -> so we can calculate how the paddle may move to reach the ball
     if x_velocity:
@@ -204,36 +297,146 @@ def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velo
     max_centre_y_reachable = min(table_height - paddle_height/2, max_centre_y_reachable)
     min_centre_y_reachable = max(paddle_height/2, min_centre_y_reachable)
 
-    # Generate "angles" of impact
-    angles_of_impact = {}
-    paddle_angle_sign = -1 if current_paddle_hit_x_pos < opponent_paddle_hit_x else 1
-    paddle_facing = 1 if current_paddle_hit_x_pos < opponent_paddle_hit_x else 0
-    for possible_paddle_centre_y in range(int(min_centre_y_reachable), int(max_centre_y_reachable) + 2):  # plus 2 to ensure we still include all points
-        angles_of_impact[paddle_angle_sign * max(-0.5, min(0.5, (y_position_of_ball_hitting_current_paddle - possible_paddle_centre_y) / paddle_height)) * 45 * math.pi / 180] = possible_paddle_centre_y
+    # Finished results only depend on the trajectory and the (integer) range of paddle positions that can hit the ball
+    range_key = (int(min_centre_y_reachable), int(max_centre_y_reachable))
+    if range_key in plan["returns"]:
+        return plan["returns"][range_key]
 
-    # This dictionary will be returned with the function
+    # Find all possible reflections and record their landing positions, board hitting positions, and x-velocity.
+    # The first time a trajectory needs a paddle position that is not known yet, every paddle position that could
+    # ever hit it is swept at once with numpy, so later frames only look their reflections up
+    reflections = plan["reflections"]
+    possible_paddle_centres = range(int(min_centre_y_reachable), int(max_centre_y_reachable) + 2)
+    if any(possible_paddle_centre_y not in reflections for possible_paddle_centre_y in possible_paddle_centres):
+        sweep_start = min(possible_paddle_centres.start, int(max(paddle_height/2, destination_min_paddle_centre_y)) - 2)
+        sweep_stop = max(possible_paddle_centres.stop, int(min(table_height - paddle_height/2, destination_max_paddle_centre_y)) + 2)
+        reflections.update(calculate_returns(range(sweep_start, sweep_stop), y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity, current_paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter))
     return_landing_spots = {}
+    for possible_paddle_centre_y in possible_paddle_centres:
+        reflection = reflections[possible_paddle_centre_y]
+        if reflection is None:
+            return_landing_spots = {}
+            break
+        return_landing_spots[reflection[:2]] = possible_paddle_centre_y
+
+    if not return_landing_spots:
+        return_landing_spots = {(table_height/2, 1): y_position_of_ball_hitting_current_paddle}  # return generic stuff if necessary
+    plan["returns"][range_key] = return_landing_spots
+    return return_landing_spots
+
 
-    # Find all possible reflections and record their landing positions, board hitting positions, and x-velocity
-    # This portion of the code is taken directly from the pong game engine as it appears to be
-    #   O(1) time complexity for each angle
-    for theta in angles_of_impact:
-        return_velocity = [math.cos(theta) * approaching_x_velocity - math.sin(theta) * approaching_y_velocity,
-                           math.sin(theta) * approaching_x_velocity + math.cos(theta) * approaching_y_velocity]
-        return_velocity[0] = - return_velocity[0]
-        return_velocity = [math.cos(-theta) * return_velocity[0] - math.sin(-theta) * return_velocity[1],
-                           math.cos(-theta) * return_velocity[1] + math.sin(-theta) * return_velocity[0]]
-        if return_velocity[0] * (2 * paddle_facing - 1) < 1:
-            # Prevent resetting ball gives a velocity of 0, because in game engine, this calculation can be done BETWEEN steps and ensure velocity isn't too small
-            if return_velocity[0] ** 2 + return_velocity[1] ** 2 - 1 < 0 or return_velocity[1] == 0:
-                return {(table_height/2, 1): y_position_of_ball_hitting_current_paddle}  # return generic stuff if necessary
-            return_velocity[1] = (return_velocity[1] / abs(return_velocity[1])) * math.sqrt(
-                return_velocity[0] ** 2 + return_velocity[1] ** 2 - 1)
-            return_velocity[0] = (2 * paddle_facing - 1)
-        return_velocity = [return_velocity[0] * 1.2, return_velocity[1] * 1.2]
-        # calculate returning landing position
-        return_landing_location = calculate_landing_spot(current_paddle_hit_x_pos, y_position_of_ball_hitting_current_paddle, opponent_paddle_hit_x, return_velocity[0], return_velocity[1], table_height, ball_diameter)[0]
-        return_landing_spots[(return_landing_location, return_velocity[0])] = angles_of_impact[theta]
-    if return_landing_spots:
-        return return_landing_spots
-    return {(table_height/2, 1): y_position_of_ball_hitting_current_paddle}  # return generic stuff if necessary
+def calculate_returns(paddle_centres, y_position_of_ball_hitting_paddle, approaching_x_velocity, approaching_y_velocity, paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter):
+    """
+    Calculate where the ball goes for every paddle centre at once, using numpy arrays
+    This is the reflection from the pong game engine, applied to all candidate paddle positions together
+    :param paddle_centres: y positions of the paddle's centre when the ball hits it
+    :param y_position_of_ball_hitting_paddle: y position of the ball when it hits the paddle
+    :param approaching_x_velocity: ball's x velocity when it hits the paddle
+    :param approaching_y_velocity: ball's y velocity when it hits the paddle
+    :param paddle_hit_x_pos: x position of the paddle when the ball hits it
+    :param opponent_paddle_hit_x: x position of the opponent paddle when the ball hits it
+    :param paddle_height: height of the paddle
+    :param table_height: height of the table
+    :param ball_diameter: diameter of the ball
+    :return: dictionary of {paddle centre: (landing spot at opponent_paddle_hit_x, x-velocity, y-velocity)},
+        with None for paddle centres where the game engine's minimum speed correction cannot be applied
+    """
+    import numpy as np
+    paddle_angle_sign = -1 if paddle_hit_x_pos < opponent_paddle_hit_x else 1
+    paddle_facing = 1 if paddle_hit_x_pos < opponent_paddle_hit_x else 0
+    paddle_offsets = paddle_angle_sign * np.clip((y_position_of_ball_hitting_paddle - np.array(paddle_centres, dtype=float)) / paddle_height, -0.5, 0.5)
+    two_theta = paddle_offsets * 2 * 45 * np.pi / 180
+    cos_2theta, sin_2theta = np.cos(two_theta), np.sin(two_theta)
+
+    # rotating into the paddle's frame, flipping and rotating back is a reflection by twice the paddle's angle
+    return_x_velocity = sin_2theta * approaching_y_velocity - cos_2theta * approaching_x_velocity
+    return_y_velocity = sin_2theta * approaching_x_velocity + cos_2theta * approaching_y_velocity
+
+    # Prevent resetting ball gives a velocity of 0, because in game engine, this calculation can be done BETWEEN steps and ensure velocity isn't too small
+    too_slow = return_x_velocity * (2 * paddle_facing - 1) < 1
+    speed_squared_left = return_x_velocity ** 2 + return_y_velocity ** 2 - 1
+    impossible = too_slow & ((speed_squared_left < 0) | (return_y_velocity == 0))
+    return_y_velocity = np.where(too_slow, np.sign(return_y_velocity) * np.sqrt(np.maximum(speed_squared_left, 0)), return_y_velocity)
+    return_x_velocity = np.where(too_slow, 2 * paddle_facing - 1, return_x_velocity)
+    return_x_velocity = return_x_velocity * 1.2
+    return_y_velocity = return_y_velocity * 1.2
+
+    # calculate returning landing positions
+    return_landing_locations = calculate_landing_spots(paddle_hit_x_pos, y_position_of_ball_hitting_paddle, opponent_paddle_hit_x, return_x_velocity, return_y_velocity, table_height, ball_diameter)[0]
+    returns = {}
+    for paddle_centre_y, landing, x_velocity, y_velocity, bad in zip(paddle_centres, return_landing_locations.tolist(), return_x_velocity.tolist(), return_y_velocity.tolist(), impossible.tolist()):
+        returns[paddle_centre_y] = None if bad else (landing, x_velocity, y_velocity)
+    return returns
+
+
+def calculate_landing_spots(current_centre_x, current_centre_y, destination_x, x_velocity, y_velocity, table_height, ball_diameter):
+    """
+    calculate_landing_spot for arrays of velocities: the same line equation and bounce folding, done with numpy
+    :param current_centre_x: x-coordinate of ball's centre
+    :param current_centre_y: y-coordinate of ball's centre
+    :param destination_x: x-coordinate of where the ball will be hitting
+    :param x_velocity: array of ball x-velocities
+    :param y_velocity: array of ball y-velocities
+    :param table_height: height of table
+    :param ball_diameter: ball's diameter
+    :return: arrays of destination_y, destination x-velocity, destination y-velocity
+    """
+    import numpy as np
+    x_velocity = np.asarray(x_velocity, dtype=float)
+    y_velocity = np.asarray(y_velocity, dtype=float)
+    slope = y_velocity / np.where(x_velocity != 0, x_velocity, 0.001)
+
+    # Use simple line equation to predict landing location, first ignore bouncing
+    expected_destination = current_centre_y + slope * (destination_x - current_centre_x)
+    approaching_from_positive_y = (current_centre_x - destination_x) * slope > 0
+
+    # Use these parameters to check how the ball will bounce (ball's radius affects how it bounces)
+    top_y_bounceback_pos = table_height - ball_diameter/2
+    bottom_y_bounceback_pos = ball_diameter/2
+    middle_region_thickness = table_height - ball_diameter
+
+    # Balls that ever hit the bottom side of board, and balls that ever hit the top side
+    hits_bottom = expected_destination > top_y_bounceback_pos
+    hits_top = expected_destination < bottom_y_bounceback_pos
+    borders_passed_bottom = (expected_destination - top_y_bounceback_pos) // middle_region_thickness + 1
+    borders_passed_top = (bottom_y_bounceback_pos - expected_destination) // middle_region_thickness + 1
+    even_bottom = borders_passed_bottom % 2 == 0
+    even_top = borders_passed_top % 2 == 0
+
+    destination = np.where(hits_bottom,
+                           np.where(even_bottom, expected_destination - borders_passed_bottom * middle_region_thickness,
+                                    table_height - expected_destination + borders_passed_bottom * middle_region_thickness),
+                           expected_destination)
+    destination = np.where(hits_top,
+                           np.where(even_top, expected_destination + borders_passed_top * middle_region_thickness,
+                                    table_height - expected_destination - borders_passed_top * middle_region_thickness),
+                           destination)
+    approaching_from_positive_y = np.where(hits_bottom, ~even_bottom, approaching_from_positive_y)
+    approaching_from_positive_y = np.where(hits_top, even_top, approaching_from_positive_y)
+
+    y_velocity = np.where(approaching_from_positive_y, -np.abs(y_velocity), np.abs(y_velocity))
+    return destination, x_velocity, y_velocity
+
+
+def get_trajectory_plan(y_position_of_ball_hitting_paddle, approaching_x_velocity, approaching_y_velocity, paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter):
+    """
+    Find the cached plan for the ball's trajectory into a paddle, or start a new one
+    The trajectory only changes when the ball bounces, so between bounces every frame asks about the same one.
+    The key is rounded so that floating point noise in the observed velocity still finds the same plan, and a new
+    velocity means a new key. The least recently used plans are dropped once there are PLAN_CACHE_SIZE of them
+    :return: dict of:
+        "trajectory": (landing y, x-velocity, y-velocity) that all calculations for this trajectory use
+        "returns": finished calculate_ball_target results by (min, max) reachable paddle centre
+        "reflections": calculate_returns results by paddle centre
+    """
+    key = (round(y_position_of_ball_hitting_paddle, 6), round(approaching_x_velocity, 6), round(approaching_y_velocity, 6), paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter)
+    # pop and re-insert instead of move_to_end: bots in other threads may drop the key in between
+    plan = plan_cache.pop(key, None)
+    if plan is None:
+        # the rounded values, not the ones of the frame that happened to ask first, so decisions never depend on
+        # what else this process has played before
+        plan = {"trajectory": key[:3], "returns": {}, "reflections": {}}
+    plan_cache[key] = plan
+    if len(plan_cache) > PLAN_CACHE_SIZE:
+        plan_cache.popitem(last=False)
+    return plan
@@ -1,166 +1,209 @@
-def pong_ai(paddle_frect, other_paddle_frect, ball_frect, table_size):
+import bisect
+import time
+from collections import OrderedDict
+
+# This file is a whole bot on its own, as ESC180 contest entries had to be, so it shares no code with pong_ai.py:
+# calculate_landing_spot, calculate_landing_spots, calculate_returns and get_trajectory_plan are copied between the two
+# files (get_trajectory_plan here also keeps segments). A shared helper module would also escape results_cache, which
+# only fingerprints the module that defines a bot. Change a copied helper in both files.
+
+# Plans for recently seen ball trajectories, least recently used first (see get_trajectory_plan)
+plan_cache = OrderedDict()
+PLAN_CACHE_SIZE = 256
+# Seconds each decision of the pong_ai function may spend checking the opponent's replies, None to always check every return
+# (PongAI instances take their own search_time_budget)
+SEARCH_TIME_BUDGET = None
+
+
+class PongAI:
     """
-    Determine where the paddle should move to, given relevant information of the board
-    All objects are rectangles with positions referencing the top left corner.
-        0             x
-        |------------->
-        |
-        |
-        |
-    y   v
-    :param paddle_frect: paddle_frect.pos = [x, y], paddle_frect.size = [x_size, y_size]
-    :param other_paddle_frect: other_paddle_frect.pos = [x, y], other_paddle_frect.size = [x_size, y_size]
-    :param ball_frect: ball_frect.pos = [x, y], ball_frect.size = [x_size, y_size]
-    :param table_size: [x_size, y_size]
-    :return: "up" or "down"
+    Andy Gong's pong AI as a bot object (see pong_engine.py): every instance keeps its own velocity estimate, so any
+    number of them can play at the same time in one process
     """
-    # Memorize previous position to calculate velocity
-    if "previous_position" not in dir(pong_ai):
-        pong_ai.previous_position = [0, 0]
-
     # Requirement of team name
-    pong_ai.team_name = "Andy Gong"
-
-    # Gather ball information: centre position and velocity.
-    ball_diameter = ball_frect.size[0]
-    ball_centre = [ball_frect.pos[0]+ball_diameter/2, ball_frect.pos[1]+ball_diameter/2]
-    ball_velocity = [ball_centre[0]-pong_ai.previous_position[0], ball_centre[1]-pong_ai.previous_position[1]]
-    pong_ai.previous_position = ball_centre[:]  # Update previous_position
-
-    # Determine at what x-coordinate will the ball's centre be when it hits the paddle
-    # Note:
-    #     consider both possible location of the paddle (left and right)
-    #     for impact x-pos, consider the ball's own radius affecting impact position
-    paddle_hit_x_pos = paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] > other_paddle_frect.pos[0] else paddle_frect.pos[0] + paddle_frect.size[0] + ball_diameter/2
-    enemy_paddle_hit_x_pos = other_paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] < other_paddle_frect.pos[0] else other_paddle_frect.pos[0] + other_paddle_frect.size[0] + ball_diameter/2
-    nearest_wall_x = 0 if paddle_hit_x_pos < enemy_paddle_hit_x_pos else table_size[0]
-
-    # y-coordinate for both paddles (current state)
-    enemy_paddle_max_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]
-    enemy_paddle_min_y = other_paddle_frect.pos[1]
-    paddle_centre_y = paddle_frect.pos[1] + paddle_frect.size[1]/2
-    enemy_paddle_centre_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]/2
-
-    # if ball approaching, note here approaching originally used paddle_hit_x_pos, now uses paddle_nearest_wall
-    # This was done because sometimes the paddle thought the ball passed the paddle and decided to go back to middle...
-    if ball_velocity[0] * (nearest_wall_x - ball_centre[0]) > 0:
-        # If the ball is approaching, find how the ball will contact paddle (y-coordinate and velocity)
-        ball_return_landing_spots_and_speed = calculate_ball_target(ball_centre[0], ball_centre[1],
-                          ball_velocity[0], ball_velocity[1],
-                          paddle_hit_x_pos, enemy_paddle_hit_x_pos,
-                          paddle_centre_y,
-                          paddle_frect.size[1],
-                          table_size[1], ball_diameter)
+    team_name = "Andy Gong"
+
+    def __init__(self, search_time_budget=None):
+        """
+        :param search_time_budget: seconds each decision may spend checking the opponent's replies, None to always check every return
+        """
+        self.search_time_budget = search_time_budget
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the ball's previous position, called before every match
+        """
+        # Memorize previous position to calculate velocity
+        self.previous_position = [0, 0]
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        """
+        Determine where the paddle should move to, given relevant information of the board
+        All objects are rectangles with positions referencing the top left corner.
+            0             x
+            |------------->
+            |
+            |
+            |
+        y   v
+        :param paddle_frect: paddle_frect.pos = [x, y], paddle_frect.size = [x_size, y_size]
+        :param other_paddle_frect: other_paddle_frect.pos = [x, y], other_paddle_frect.size = [x_size, y_size]
+        :param ball_frect: ball_frect.pos = [x, y], ball_frect.size = [x_size, y_size]
+        :param table_size: [x_size, y_size]
+        :return: "up" or "down"
+        """
+        # Gather ball information: centre position and velocity.
+        ball_diameter = ball_frect.size[0]
+        ball_centre = [ball_frect.pos[0]+ball_diameter/2, ball_frect.pos[1]+ball_diameter/2]
+        ball_velocity = [ball_centre[0]-self.previous_position[0], ball_centre[1]-self.previous_position[1]]
+        self.previous_position = ball_centre[:]  # Update previous_position
+
+        # Determine at what x-coordinate will the ball's centre be when it hits the paddle
+        # Note:
+        #     consider both possible location of the paddle (left and right)
+        #     for impact x-pos, consider the ball's own radius affecting impact position
+        paddle_hit_x_pos = paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] > other_paddle_frect.pos[0] else paddle_frect.pos[0] + paddle_frect.size[0] + ball_diameter/2
+        enemy_paddle_hit_x_pos = other_paddle_frect.pos[0] - ball_diameter/2 if paddle_frect.pos[0] < other_paddle_frect.pos[0] else other_paddle_frect.pos[0] + other_paddle_frect.size[0] + ball_diameter/2
+        nearest_wall_x = 0 if paddle_hit_x_pos < enemy_paddle_hit_x_pos else table_size[0]
+
+        # y-coordinate for both paddles (current state)
+        enemy_paddle_max_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]
+        enemy_paddle_min_y = other_paddle_frect.pos[1]
+        paddle_centre_y = paddle_frect.pos[1] + paddle_frect.size[1]/2
+        enemy_paddle_centre_y = other_paddle_frect.pos[1] + other_paddle_frect.size[1]/2
+
+        # if ball approaching, note here approaching originally used paddle_hit_x_pos, now uses paddle_nearest_wall
+        # This was done because sometimes the paddle thought the ball passed the paddle and decided to go back to middle...
+        if ball_velocity[0] * (nearest_wall_x - ball_centre[0]) > 0:
+            # If the ball is approaching, find how the ball will contact paddle (y-coordinate and velocity)
+            ball_return_segments = calculate_ball_target(ball_centre[0], ball_centre[1],
+                              ball_velocity[0], ball_velocity[1],
+                              paddle_hit_x_pos, enemy_paddle_hit_x_pos,
+                              paddle_centre_y,
+                              paddle_frect.size[1],
+                              table_size[1], ball_diameter, as_segments=True)
         
-        frame_until_impact_to_me = (paddle_hit_x_pos - ball_centre[0]) / ball_velocity[0] if ball_velocity[0] != 0 else 10000
-
-        # Given the landing position and velocity, find the way of hitting that ensures best chance of winning
-        # Find choices that guarantees the paddle cannot hit the ball back
-        guarantee_win_distance = 0
-        guarantee_win_hitting_position = -1
-        for (return_y_pos, return_x_velocity, _), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
-            frame_until_impact_opponent = frame_until_impact_to_me + (enemy_paddle_hit_x_pos - paddle_hit_x_pos) / return_x_velocity if return_x_velocity != 0 else 10000
-            opponent_gap_to_ball = paddle_hit_ball_min_distance(frame_until_impact_opponent, return_y_pos, enemy_paddle_centre_y, other_paddle_frect.size[1], table_size[1], ball_diameter)
-            if opponent_gap_to_ball == 0:
-                continue
-            if guarantee_win_distance < opponent_gap_to_ball:
-                guarantee_win_distance = opponent_gap_to_ball
-                guarantee_win_hitting_position = centre_hitting_pos
-            # A debug message to show the guarantee win position
-            # print("Guarantee win: \topp_curr_y", enemy_paddle_centre_y, "\tball lands: ", return_y_pos, "\tball x-vel: ", return_x_velocity, "\tball hits us at: ", centre_hitting_pos, "\tWe are at: ", paddle_centre_y)
-
-        if guarantee_win_hitting_position != -1:
-            if paddle_centre_y < guarantee_win_hitting_position:
-                return "down"
-            if paddle_centre_y > guarantee_win_hitting_position:
-                return "up"
-            return
+            frame_until_impact_to_me = (paddle_hit_x_pos - ball_centre[0]) / ball_velocity[0] if ball_velocity[0] != 0 else 10000
+
+            # Given the landing position and velocity, find the way of hitting that ensures best chance of winning
+            # Find choices that guarantees the paddle cannot hit the ball back
+            guarantee_win_distance = 0
+            guarantee_win_hitting_position = -1
+            for segment in ball_return_segments:
+                # The opponent can reach every other return of this segment, so none of them can win
+                for i in returns_out_of_reach(segment, frame_until_impact_to_me, enemy_paddle_hit_x_pos - paddle_hit_x_pos, enemy_paddle_centre_y, other_paddle_frect.size[1], table_size[1], ball_diameter):
+                    return_y_pos, return_x_velocity, centre_hitting_pos = segment[5][i], segment[6][i], segment[8][i]
+                    frame_until_impact_opponent = frame_until_impact_to_me + (enemy_paddle_hit_x_pos - paddle_hit_x_pos) / return_x_velocity if return_x_velocity != 0 else 10000
+                    opponent_gap_to_ball = paddle_hit_ball_min_distance(frame_until_impact_opponent, return_y_pos, enemy_paddle_centre_y, other_paddle_frect.size[1], table_size[1], ball_diameter)
+                    if opponent_gap_to_ball == 0:
+                        continue
+                    if guarantee_win_distance < opponent_gap_to_ball:
+                        guarantee_win_distance = opponent_gap_to_ball
+                        guarantee_win_hitting_position = centre_hitting_pos
+                    # A debug message to show the guarantee win position
+                    # print("Guarantee win: \topp_curr_y", enemy_paddle_centre_y, "\tball lands: ", return_y_pos, "\tball x-vel: ", return_x_velocity, "\tball hits us at: ", centre_hitting_pos, "\tWe are at: ", paddle_centre_y)
+
+            if guarantee_win_hitting_position != -1:
+                if paddle_centre_y < guarantee_win_hitting_position:
+                    return "down"
+                if paddle_centre_y > guarantee_win_hitting_position:
+                    return "up"
+                return
         
-        # There is no guarantee win, find spots where the opponent cannot guarantee their win (for each hit back, calculate if opponent can hit the ball to a location we cannot reach in time)
-        best_return_score = -1
-        best_hitting_position_for_paddle_centre = -1
-        for (return_y_pos, return_x_velocity, return_y_velocity), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
-            possible_spots_and_speed_for_ball_coming_back = calculate_ball_target(return_y_pos, enemy_paddle_centre_y, return_x_velocity, return_y_velocity, enemy_paddle_hit_x_pos, paddle_hit_x_pos, enemy_paddle_centre_y, paddle_frect.size[1], table_size[1], ball_diameter, frame_until_impact_to_me)
-            
-            opponent_will_win = False
-
-            # Check possible spots the opponent can return the ball to if we hit it this way. Opponent guarantees win if they can hit the ball to a spot we cannot reach in time
-            for (opponent_return_y_pos, opponent_return_x_velocity, _), _ in possible_spots_and_speed_for_ball_coming_back.items():
+            # There is no guarantee win, find spots where the opponent cannot guarantee their win (for each hit back, calculate if opponent can hit the ball to a location we cannot reach in time)
+            # Score every return first (how far it lands from the opponent paddle, weighted by speed) and search the best ones first:
+            # the first return the opponent cannot punish is the answer, so the search stops there.
+            # The sort is stable, so equal scores keep their order and the same return wins as when every return was searched
+            candidate_returns = []
+            for segment in ball_return_segments:
+                for return_y_pos, return_x_velocity, return_y_velocity, centre_hitting_pos in iter_segment_returns(segment):
+                    if enemy_paddle_min_y <= return_y_pos <= enemy_paddle_max_y:
+                        return_y_dist = 0
+                    else:
+                        return_y_dist = min(abs(return_y_pos-enemy_paddle_max_y), abs(return_y_pos-enemy_paddle_min_y))
+                    candidate_returns.append((abs(return_y_dist * return_x_velocity), return_y_pos, return_x_velocity, return_y_velocity, centre_hitting_pos))
+            candidate_returns.sort(key=lambda candidate: -candidate[0])
+
+            # If nothing is safe (or we run out of time before finding a safe return), use old algorithm: the best scoring return
+            best_hitting_position_for_paddle_centre = candidate_returns[0][4]
+            search_deadline = time.perf_counter() + self.search_time_budget if self.search_time_budget is not None else None
+
+            for _, return_y_pos, return_x_velocity, return_y_velocity, centre_hitting_pos in candidate_returns:
+                if search_deadline is not None and time.perf_counter() > search_deadline:
+                    break
+                possible_segments_for_ball_coming_back = calculate_ball_target(return_y_pos, enemy_paddle_centre_y, return_x_velocity, return_y_velocity, enemy_paddle_hit_x_pos, paddle_hit_x_pos, enemy_paddle_centre_y, paddle_frect.size[1], table_size[1], ball_diameter, frame_until_impact_to_me, as_segments=True)
+
+                # Check possible spots the opponent can return the ball to if we hit it this way. Opponent guarantees win if they can hit the ball to a spot we cannot reach in time
                 # Frame to reach me is: ball reach me first + time to hit opponent + time for opponent to hit back
-                frames_until_ball_comes_back_to_me = frame_until_impact_to_me + ((enemy_paddle_hit_x_pos - paddle_hit_x_pos) / return_x_velocity if return_x_velocity != 0 else 10000) + ((paddle_hit_x_pos - enemy_paddle_hit_x_pos) / opponent_return_x_velocity if opponent_return_x_velocity != 0 else 10000)
-                my_gap_to_ball = paddle_hit_ball_min_distance(frames_until_ball_comes_back_to_me, opponent_return_y_pos, paddle_centre_y, paddle_frect.size[1], table_size[1], ball_diameter)
-                if my_gap_to_ball > 0:
-                    opponent_will_win = True
+                frames_until_ball_reaches_opponent = frame_until_impact_to_me + ((enemy_paddle_hit_x_pos - paddle_hit_x_pos) / return_x_velocity if return_x_velocity != 0 else 10000)
+                opponent_will_win = returns_escape_paddle(possible_segments_for_ball_coming_back, frames_until_ball_reaches_opponent, paddle_hit_x_pos - enemy_paddle_hit_x_pos, paddle_centre_y, paddle_frect.size[1], table_size[1], ball_diameter)
+
+                if not opponent_will_win:
+                    best_hitting_position_for_paddle_centre = centre_hitting_pos
                     break
 
-            if opponent_will_win:
-                continue
+                # TODO: Also check if there are any spots where all possible returns will give US a guaranteed win 
+                # TODO: (or the most likely for us winning, such as winning return spots are all close to us... almost all returns are wins...)
+
+                # TODO: rank the possible return spots by how likely opponent will return the ball to a spot we can easily reach (maybe take weighted average of all possible return spots by velocity and distance)
+                # TODO: I think a key improvement is to not OVER-WEIGH cases where multiple paths go to same spot with same velocity. 
+                # TODO: weigh by each destination square and MAX velocity to reach that square. Sum/Weigh by SQUARE and not ball trajectory
 
-            # TODO: Also check if there are any spots where all possible returns will give US a guaranteed win 
-            # TODO: (or the most likely for us winning, such as winning return spots are all close to us... almost all returns are wins...)
+            # TODO: add checks for all possible return landing spots, choose the one that has the highest gap between the ball's y and opponent's paddle's y
+            # TODO: essentially create a check for the ball's return x velocity and see how far the opponent paddle can reach given this x velocity
+            # TODO: if all possible return x velocity does allow the opponent paddle to reach the ball, choose the target that makes the opponent paddle "forced" to return ball to a favourable position for us
+            # TODO: Favourable position = where we won't lose, then it's better if we can force a win. 
+            # TODO: It's even better if we can force the opponent to return the ball to a position that WE guarantee a victory
+            # TODO: If no victory return spot possible, choose the one where the opponent return spot has a very low spread / low x velocity
 
-            # TODO: rank the possible return spots by how likely opponent will return the ball to a spot we can easily reach (maybe take weighted average of all possible return spots by velocity and distance)
+            if paddle_centre_y < best_hitting_position_for_paddle_centre:
+                return "down"
+            if paddle_centre_y > best_hitting_position_for_paddle_centre:
+                return "up"
+            return
+
+        # ball is leaving
+        else:
+            # If ball is leaving, find how it may be hit back and move to average location
+            ball_return_landing_spots_and_speed = calculate_ball_target(ball_centre[0], ball_centre[1],
+                                                                        ball_velocity[0], ball_velocity[1],
+                                                                        enemy_paddle_hit_x_pos, paddle_hit_x_pos,
+                                                                        enemy_paddle_centre_y,
+                                                                        other_paddle_frect.size[1],
+                                                                        table_size[1], ball_diameter)
             # TODO: I think a key improvement is to not OVER-WEIGH cases where multiple paths go to same spot with same velocity. 
             # TODO: weigh by each destination square and MAX velocity to reach that square. Sum/Weigh by SQUARE and not ball trajectory
-            
-            if enemy_paddle_min_y <= return_y_pos <= enemy_paddle_max_y:
-                return_y_dist = 0
+            sum_x_velocity = 0
+            sum_velocity_and_position_product = 0
+            for (return_y_pos, return_x_velocity, _), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
+                sum_x_velocity += return_x_velocity
+                sum_velocity_and_position_product += return_x_velocity * return_y_pos
+            if sum_x_velocity == 0:
+                average_interception_point = sum_velocity_and_position_product
             else:
-                return_y_dist = min(abs(return_y_pos-enemy_paddle_max_y), abs(return_y_pos-enemy_paddle_min_y))
-            if best_return_score < abs(return_y_dist * return_x_velocity):
-                best_return_score = abs(return_y_dist * return_x_velocity)
-                best_hitting_position_for_paddle_centre = centre_hitting_pos
-
-        if (best_return_score == -1):
-            # print("No best return score found") 
-            # Using old algorithm to find the best return score
-            for (return_y_pos, return_x_velocity, return_y_velocity), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
-                if enemy_paddle_min_y <= return_y_pos <= enemy_paddle_max_y:
-                    return_y_dist = 0
-                else:
-                    return_y_dist = min(abs(return_y_pos-enemy_paddle_max_y), abs(return_y_pos-enemy_paddle_min_y))
-                if best_return_score < abs(return_y_dist * return_x_velocity):
-                    best_return_score = abs(return_y_dist * return_x_velocity)
-                    best_hitting_position_for_paddle_centre = centre_hitting_pos
-                    
-        # TODO: add checks for all possible return landing spots, choose the one that has the highest gap between the ball's y and opponent's paddle's y
-        # TODO: essentially create a check for the ball's return x velocity and see how far the opponent paddle can reach given this x velocity
-        # TODO: if all possible return x velocity does allow the opponent paddle to reach the ball, choose the target that makes the opponent paddle "forced" to return ball to a favourable position for us
-        # TODO: Favourable position = where we won't lose, then it's better if we can force a win. 
-        # TODO: It's even better if we can force the opponent to return the ball to a position that WE guarantee a victory
-        # TODO: If no victory return spot possible, choose the one where the opponent return spot has a very low spread / low x velocity
-
-        if paddle_centre_y < best_hitting_position_for_paddle_centre:
-            return "down"
-        if paddle_centre_y > best_hitting_position_for_paddle_centre:
-            return "up"
-        return
-
-    # ball is leaving
-    else:
-        # If ball is leaving, find how it may be hit back and move to average location
-        ball_return_landing_spots_and_speed = calculate_ball_target(ball_centre[0], ball_centre[1],
-                                                                    ball_velocity[0], ball_velocity[1],
-                                                                    enemy_paddle_hit_x_pos, paddle_hit_x_pos,
-                                                                    enemy_paddle_centre_y,
-                                                                    other_paddle_frect.size[1],
-                                                                    table_size[1], ball_diameter)
-        # TODO: I think a key improvement is to not OVER-WEIGH cases where multiple paths go to same spot with same velocity. 
-        # TODO: weigh by each destination square and MAX velocity to reach that square. Sum/Weigh by SQUARE and not ball trajectory
-        sum_x_velocity = 0
-        sum_velocity_and_position_product = 0
-        for (return_y_pos, return_x_velocity, _), centre_hitting_pos in ball_return_landing_spots_and_speed.items():
-            sum_x_velocity += return_x_velocity
-            sum_velocity_and_position_product += return_x_velocity * return_y_pos
-        if sum_x_velocity == 0:
-            average_interception_point = sum_velocity_and_position_product
-        else:
-            average_interception_point = sum_velocity_and_position_product / sum_x_velocity
-        if paddle_centre_y < average_interception_point:
-            return "down"
-        if paddle_centre_y > average_interception_point:
-            return "up"
-        return
+                average_interception_point = sum_velocity_and_position_product / sum_x_velocity
+            if paddle_centre_y < average_interception_point:
+                return "down"
+            if paddle_centre_y > average_interception_point:
+                return "up"
+            return
+
+
+# The bot behind the pong_ai function. All callers of the function share it, so use PongAI instances to play more than one game at a time
+legacy_bot = PongAI()
+
+
+def pong_ai(paddle_frect, other_paddle_frect, ball_frect, table_size):
+    """
+    The original move_getter interface of the AI, see PongAI.decide
+    Every caller plays with legacy_bot, which is never reset
+    :return: "up" or "down"
+    """
+    # Requirement of team name
+    pong_ai.team_name = PongAI.team_name
+    legacy_bot.search_time_budget = SEARCH_TIME_BUDGET
+    return legacy_bot.decide(paddle_frect, other_paddle_frect, ball_frect, table_size)
 
 
 def calculate_landing_spot(current_centre_x, current_centre_y, destination_x, x_velocity, y_velocity, table_height, ball_diameter):
@@ -216,7 +259,7 @@ def calculate_landing_spot(current_centre_x, current_centre_y, destination_x, x_
     return expected_destination, x_velocity, y_velocity
 
 
-def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velocity, current_paddle_hit_x_pos, opponent_paddle_hit_x, current_paddle_middle_y, paddle_height, table_height, ball_diameter, start_frame_offset=0):
+def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velocity, current_paddle_hit_x_pos, opponent_paddle_hit_x, current_paddle_middle_y, paddle_height, table_height, ball_diameter, start_frame_offset=0, as_segments=False):
     """
     Calculate: if the ball hits "current_paddle" at current_paddle_hit_x_pos, where will the ball be reflected to "opponent_paddle_hit_x"
     :param current_centre_x: ball's x position
@@ -230,6 +273,7 @@ def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velo
     :param ball_diameter: diameter of the ball
     :param paddle_height: height of the paddle
     :param start_frame_offset: the offset to add to the range of current paddle's movement (used for predicting future return behaviour), default 0
+    :param as_segments: return the same returns as calculate_return_segments segments instead of a dictionary, default False
 
     :return: a dictionary of: 
         {
@@ -238,9 +282,10 @@ def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velo
         }
         If impossible to hit the ball, return [middle of game table: current expected landing spot of ball hitting current_paddle]
     """
-    import math
     # Determine how will the ball approach CURRENT PADDLE
     y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity = calculate_landing_spot(current_centre_x, current_centre_y, current_paddle_hit_x_pos, x_velocity, y_velocity, table_height, ball_diameter)
+    plan = get_trajectory_plan(y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity, current_paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter)
+    y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity = plan["trajectory"]
 
     # Find time remaining until ball hits current paddle -> so we can calculate how the paddle may move to reach the ball
     if x_velocity:
@@ -267,6 +312,8 @@ def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velo
         # Score wise, set any arbitrary velocity, of 1
         # Just assume that the ball will get returned to the middle of the table with speed 1 if the paddle can somehow reach the ball
         # TODO: Can let it return some special data indicate that "it's impossible to hit the ball"
+        if as_segments:
+            return calculate_return_segments({(table_height/2, 0, 0): y_position_of_ball_hitting_current_paddle})
         return {(table_height/2, 0, 0): y_position_of_ball_hitting_current_paddle}
 
     # 4 scenarios: max_reachable_by_paddle > max_paddle_pos_that_can_hit_ball_at_destination, min_reachable_by_paddle < min_paddle_pos_that_can_hit_ball_at_destination.
@@ -291,44 +338,286 @@ def calculate_ball_target(current_centre_x, current_centre_y, x_velocity, y_velo
     max_centre_y_reachable = min(table_height - paddle_height/2, max_centre_y_reachable)
     min_centre_y_reachable = max(paddle_height/2, min_centre_y_reachable)
 
-    # Generate "angles" of impact, dict with key as angle of impact, value as y-coordinate of paddle when ball hits
-    angles_of_impact = {}
-    paddle_angle_sign = -1 if current_paddle_hit_x_pos < opponent_paddle_hit_x else 1
-    paddle_facing = 1 if current_paddle_hit_x_pos < opponent_paddle_hit_x else 0
-    for possible_paddle_centre_y in range(int(min_centre_y_reachable) - 2, int(max_centre_y_reachable) + 2): 
-        angles_of_impact[paddle_angle_sign * max(-0.5, min(0.5, (y_position_of_ball_hitting_current_paddle - possible_paddle_centre_y) / paddle_height)) * 45 * math.pi / 180] = possible_paddle_centre_y
-
-    # This dictionary will be returned with the function
+    # Finished results only depend on the trajectory and the (integer) range of paddle positions that can hit the ball
+    range_key = (int(min_centre_y_reachable), int(max_centre_y_reachable))
+    if range_key in plan["returns"]:
+        return get_return_segments(plan, range_key) if as_segments else plan["returns"][range_key]
+
+    # Find all possible reflections and record their landing positions, board hitting positions, and x-velocity.
+    # The first time a trajectory needs a paddle position that is not known yet, every paddle position that could
+    # ever hit it is swept at once with numpy, so later frames only look their reflections up
+    reflections = plan["reflections"]
+    possible_paddle_centres = range(int(min_centre_y_reachable) - 2, int(max_centre_y_reachable) + 2)
+    if any(possible_paddle_centre_y not in reflections for possible_paddle_centre_y in possible_paddle_centres):
+        sweep_start = min(possible_paddle_centres.start, int(max(paddle_height/2, destination_min_paddle_centre_y)) - 2)
+        sweep_stop = max(possible_paddle_centres.stop, int(min(table_height - paddle_height/2, destination_max_paddle_centre_y)) + 2)
+        reflections.update(calculate_returns(range(sweep_start, sweep_stop), y_position_of_ball_hitting_current_paddle, approaching_x_velocity, approaching_y_velocity, current_paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter))
     return_landing_spots = {}
-
-    # Find all possible reflections and record their landing positions, board hitting positions, and x-velocity
-    # This portion of the code is taken directly from the pong game engine as it appears to be
-    #   O(1) time complexity for each angle
-    for theta in angles_of_impact:
-        return_velocity = [math.cos(theta) * approaching_x_velocity - math.sin(theta) * approaching_y_velocity,
-                           math.sin(theta) * approaching_x_velocity + math.cos(theta) * approaching_y_velocity]
-        return_velocity[0] = - return_velocity[0]
-        return_velocity = [math.cos(-theta) * return_velocity[0] - math.sin(-theta) * return_velocity[1],
-                           math.cos(-theta) * return_velocity[1] + math.sin(-theta) * return_velocity[0]]
-        if return_velocity[0] * (2 * paddle_facing - 1) < 1:
-            # Prevent resetting ball gives a velocity of 0, because in game engine, this calculation can be done BETWEEN steps and ensure velocity isn't too small
-            if return_velocity[0] ** 2 + return_velocity[1] ** 2 - 1 < 0 or return_velocity[1] == 0:
-                return {(table_height/2, 0, 0): y_position_of_ball_hitting_current_paddle}  # return generic stuff if necessary
-            return_velocity[1] = (return_velocity[1] / abs(return_velocity[1])) * math.sqrt(
-                return_velocity[0] ** 2 + return_velocity[1] ** 2 - 1)
-            return_velocity[0] = (2 * paddle_facing - 1)
-        return_velocity = [return_velocity[0] * 1.2, return_velocity[1] * 1.2]
-        # calculate returning landing position
-        return_landing_location = calculate_landing_spot(current_paddle_hit_x_pos, y_position_of_ball_hitting_current_paddle, opponent_paddle_hit_x, return_velocity[0], return_velocity[1], table_height, ball_diameter)[0]
+    for possible_paddle_centre_y in possible_paddle_centres:
+        reflection = reflections[possible_paddle_centre_y]
+        if reflection is None:
+            return_landing_spots = {}
+            break
         # Do not record the hit if return velocity is in the wrong direction
-        if return_velocity[0] * (opponent_paddle_hit_x - current_paddle_hit_x_pos) < 0:
+        if reflection[1] * (opponent_paddle_hit_x - current_paddle_hit_x_pos) < 0:
             continue
-        return_landing_spots[(return_landing_location, return_velocity[0], return_velocity[1])] = angles_of_impact[theta]
-    if return_landing_spots:
-        return return_landing_spots
-    
-    # There are no possible locations, some bug occurred, return generic stuff
-    return {(table_height/2, 0, 0): y_position_of_ball_hitting_current_paddle}  # return generic stuff if necessary
+        return_landing_spots[reflection] = possible_paddle_centre_y
+
+    # There are no possible locations (or the engine would not be able to reflect one of them), return generic stuff
+    if not return_landing_spots:
+        return_landing_spots = {(table_height/2, 0, 0): y_position_of_ball_hitting_current_paddle}
+    plan["returns"][range_key] = return_landing_spots
+    return get_return_segments(plan, range_key) if as_segments else return_landing_spots
+
+
+def calculate_returns(paddle_centres, y_position_of_ball_hitting_paddle, approaching_x_velocity, approaching_y_velocity, paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter):
+    """
+    Calculate where the ball goes for every paddle centre at once, using numpy arrays
+    This is the reflection from the pong game engine, applied to all candidate paddle positions together
+    :param paddle_centres: y positions of the paddle's centre when the ball hits it
+    :param y_position_of_ball_hitting_paddle: y position of the ball when it hits the paddle
+    :param approaching_x_velocity: ball's x velocity when it hits the paddle
+    :param approaching_y_velocity: ball's y velocity when it hits the paddle
+    :param paddle_hit_x_pos: x position of the paddle when the ball hits it
+    :param opponent_paddle_hit_x: x position of the opponent paddle when the ball hits it
+    :param paddle_height: height of the paddle
+    :param table_height: height of the table
+    :param ball_diameter: diameter of the ball
+    :return: dictionary of {paddle centre: (landing spot at opponent_paddle_hit_x, x-velocity, y-velocity)},
+        with None for paddle centres where the game engine's minimum speed correction cannot be applied
+    """
+    import numpy as np
+    paddle_angle_sign = -1 if paddle_hit_x_pos < opponent_paddle_hit_x else 1
+    paddle_facing = 1 if paddle_hit_x_pos < opponent_paddle_hit_x else 0
+    paddle_offsets = paddle_angle_sign * np.clip((y_position_of_ball_hitting_paddle - np.array(paddle_centres, dtype=float)) / paddle_height, -0.5, 0.5)
+    two_theta = paddle_offsets * 2 * 45 * np.pi / 180
+    cos_2theta, sin_2theta = np.cos(two_theta), np.sin(two_theta)
+
+    # rotating into the paddle's frame, flipping and rotating back is a reflection by twice the paddle's angle
+    return_x_velocity = sin_2theta * approaching_y_velocity - cos_2theta * approaching_x_velocity
+    return_y_velocity = sin_2theta * approaching_x_velocity + cos_2theta * approaching_y_velocity
+
+    # Prevent resetting ball gives a velocity of 0, because in game engine, this calculation can be done BETWEEN steps and ensure velocity isn't too small
+    too_slow = return_x_velocity * (2 * paddle_facing - 1) < 1
+    speed_squared_left = return_x_velocity ** 2 + return_y_velocity ** 2 - 1
+    impossible = too_slow & ((speed_squared_left < 0) | (return_y_velocity == 0))
+    return_y_velocity = np.where(too_slow, np.sign(return_y_velocity) * np.sqrt(np.maximum(speed_squared_left, 0)), return_y_velocity)
+    return_x_velocity = np.where(too_slow, 2 * paddle_facing - 1, return_x_velocity)
+    return_x_velocity = return_x_velocity * 1.2
+    return_y_velocity = return_y_velocity * 1.2
+
+    # calculate returning landing positions
+    return_landing_locations = calculate_landing_spots(paddle_hit_x_pos, y_position_of_ball_hitting_paddle, opponent_paddle_hit_x, return_x_velocity, return_y_velocity, table_height, ball_diameter)[0]
+    returns = {}
+    for paddle_centre_y, landing, x_velocity, y_velocity, bad in zip(paddle_centres, return_landing_locations.tolist(), return_x_velocity.tolist(), return_y_velocity.tolist(), impossible.tolist()):
+        returns[paddle_centre_y] = None if bad else (landing, x_velocity, y_velocity)
+    return returns
+
+
+def calculate_landing_spots(current_centre_x, current_centre_y, destination_x, x_velocity, y_velocity, table_height, ball_diameter):
+    """
+    calculate_landing_spot for arrays of velocities: the same line equation and bounce folding, done with numpy
+    :param current_centre_x: x-coordinate of ball's centre
+    :param current_centre_y: y-coordinate of ball's centre
+    :param destination_x: x-coordinate of where the ball will be hitting
+    :param x_velocity: array of ball x-velocities
+    :param y_velocity: array of ball y-velocities
+    :param table_height: height of table
+    :param ball_diameter: ball's diameter
+    :return: arrays of destination_y, destination x-velocity, destination y-velocity
+    """
+    import numpy as np
+    x_velocity = np.asarray(x_velocity, dtype=float)
+    y_velocity = np.asarray(y_velocity, dtype=float)
+    slope = y_velocity / np.where(x_velocity != 0, x_velocity, 0.001)
+
+    # Use simple line equation to predict landing location, first ignore bouncing
+    expected_destination = current_centre_y + slope * (destination_x - current_centre_x)
+    approaching_from_positive_y = (current_centre_x - destination_x) * slope > 0
+
+    # Use these parameters to check how the ball will bounce (ball's radius affects how it bounces)
+    top_y_bounceback_pos = table_height - ball_diameter/2
+    bottom_y_bounceback_pos = ball_diameter/2
+    middle_region_thickness = table_height - ball_diameter
+
+    # Balls that ever hit the bottom side of board, and balls that ever hit the top side
+    hits_bottom = expected_destination > top_y_bounceback_pos
+    hits_top = expected_destination < bottom_y_bounceback_pos
+    borders_passed_bottom = (expected_destination - top_y_bounceback_pos) // middle_region_thickness + 1
+    borders_passed_top = (bottom_y_bounceback_pos - expected_destination) // middle_region_thickness + 1
+    even_bottom = borders_passed_bottom % 2 == 0
+    even_top = borders_passed_top % 2 == 0
+
+    destination = np.where(hits_bottom,
+                           np.where(even_bottom, expected_destination - borders_passed_bottom * middle_region_thickness,
+                                    table_height - expected_destination + borders_passed_bottom * middle_region_thickness),
+                           expected_destination)
+    destination = np.where(hits_top,
+                           np.where(even_top, expected_destination + borders_passed_top * middle_region_thickness,
+                                    table_height - expected_destination - borders_passed_top * middle_region_thickness),
+                           destination)
+    approaching_from_positive_y = np.where(hits_bottom, ~even_bottom, approaching_from_positive_y)
+    approaching_from_positive_y = np.where(hits_top, even_top, approaching_from_positive_y)
+
+    y_velocity = np.where(approaching_from_positive_y, -np.abs(y_velocity), np.abs(y_velocity))
+    return destination, x_velocity, y_velocity
+
+
+def get_trajectory_plan(y_position_of_ball_hitting_paddle, approaching_x_velocity, approaching_y_velocity, paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter):
+    """
+    Find the cached plan for the ball's trajectory into a paddle, or start a new one
+    The trajectory only changes when the ball bounces, so between bounces every frame asks about the same one.
+    The key is rounded so that floating point noise in the observed velocity still finds the same plan, and a new
+    velocity means a new key. The least recently used plans are dropped once there are PLAN_CACHE_SIZE of them
+    :return: dict of:
+        "trajectory": (landing y, x-velocity, y-velocity) that all calculations for this trajectory use
+        "returns": finished calculate_ball_target results by (min, max) reachable paddle centre
+        "reflections": calculate_returns results by paddle centre
+        "segments": calculate_return_segments of the finished results, by the same keys as "returns"
+    """
+    key = (round(y_position_of_ball_hitting_paddle, 6), round(approaching_x_velocity, 6), round(approaching_y_velocity, 6), paddle_hit_x_pos, opponent_paddle_hit_x, paddle_height, table_height, ball_diameter)
+    # pop and re-insert instead of move_to_end: bots in other threads may drop the key in between
+    plan = plan_cache.pop(key, None)
+    if plan is None:
+        # the rounded values, not the ones of the frame that happened to ask first, so decisions never depend on
+        # what else this process has played before
+        plan = {"trajectory": key[:3], "returns": {}, "reflections": {}, "segments": {}}
+    plan_cache[key] = plan
+    if len(plan_cache) > PLAN_CACHE_SIZE:
+        plan_cache.popitem(last=False)
+    return plan
+
+
+def calculate_return_segments(return_landing_spots):
+    """
+    Split the returns from calculate_ball_target into segments along the paddle where the landing spot keeps moving the same way
+    Each segment keeps its returns as columns sorted by landing spot, so the returns that land outside a band a paddle
+    can reach are found by bisecting instead of checking every return (see returns_out_of_reach)
+    :param return_landing_spots: dictionary returned by calculate_ball_target
+    :return: list of (lowest landing spot, highest landing spot, lowest |x-velocity|, highest |x-velocity|, descending, landing
+        spots, x-velocities, y-velocities, paddle centres), in the dictionary's order. The columns are sorted by landing spot,
+        descending says whether the dictionary had them the other way round
+    """
+    segments = []
+    segment_reflections = []
+    segment_centres = []
+    direction = 0
+    for return_reflection, centre_hitting_pos in return_landing_spots.items():
+        if segment_reflections:
+            step = return_reflection[0] - segment_reflections[-1][0]
+            if step * direction < 0:
+                segments.append(summarise_return_segment(segment_reflections, segment_centres, direction < 0))
+                segment_reflections = []
+                segment_centres = []
+                direction = 0
+            elif step:
+                direction = step
+        segment_reflections.append(return_reflection)
+        segment_centres.append(centre_hitting_pos)
+    if segment_reflections:
+        segments.append(summarise_return_segment(segment_reflections, segment_centres, direction < 0))
+    return segments
+
+
+def summarise_return_segment(segment_reflections, segment_centres, descending):
+    """
+    Build the calculate_return_segments tuple of a segment
+    :param segment_reflections: list of (landing spot, x-velocity, y-velocity), with the landing spots in order
+    :param segment_centres: list of the paddle centres of the same returns
+    :param descending: True if the landing spots go down
+    """
+    if descending:
+        segment_reflections.reverse()
+        segment_centres.reverse()
+    landing_spots, x_velocities, y_velocities = zip(*segment_reflections)
+    # Only the generic "cannot hit" return has an x-velocity of 0 (the engine never returns the ball slower than 1), and it is always
+    # alone, so the x-speed interval bounds the frames until impact of every return in the segment
+    x_speeds = [abs(return_x_velocity) for return_x_velocity in x_velocities]
+    return landing_spots[0], landing_spots[-1], min(x_speeds), max(x_speeds), descending, landing_spots, x_velocities, y_velocities, tuple(segment_centres)
+
+
+def iter_segment_returns(segment):
+    """
+    Yield (landing spot, x-velocity, y-velocity, paddle centre) of every return of a segment, in the order of calculate_ball_target
+    :param segment: segment from calculate_return_segments
+    """
+    returns = zip(segment[5], segment[6], segment[7], segment[8])
+    return reversed(list(returns)) if segment[4] else returns
+
+
+def returns_out_of_reach(segment, frames_before_return, return_distance, paddle_middle_y, paddle_height, table_height, ball_diameter):
+    """
+    Find the returns of a segment that land outside the band the paddle can reach in the least time any of them takes
+    Every other return can be hit, so only these can have a paddle_hit_ball_min_distance above 0
+    :param segment: segment from calculate_return_segments
+    :param frames_before_return: number of frames until the ball is hit back
+    :param return_distance: x distance the returned ball travels to the paddle
+    :param paddle_middle_y: y-coordinate of the paddle that has to reach the ball
+    :param paddle_height: height of the paddle
+    :param table_height: height of the table
+    :param ball_diameter: diameter of the ball
+    :return: sequence of indices into the segment's columns, in the order of calculate_ball_target
+    """
+    fastest_x_speed = segment[3]
+    least_frames = frames_before_return + (abs(return_distance) / fastest_x_speed if fastest_x_speed != 0 else 10000)
+    hitting_slack = paddle_height/2 + ball_diameter/2
+    lowest_reachable = max(paddle_height/2, paddle_middle_y - least_frames) - hitting_slack
+    highest_reachable = min(table_height - paddle_height/2, paddle_middle_y + least_frames) + hitting_slack
+    if lowest_reachable <= segment[0] and segment[1] <= highest_reachable:
+        return ()
+    landing_spots = segment[5]
+    below = bisect.bisect_left(landing_spots, lowest_reachable)
+    above = max(bisect.bisect_right(landing_spots, highest_reachable), below)
+    if segment[4]:
+        return list(range(len(landing_spots) - 1, above - 1, -1)) + list(range(below - 1, -1, -1))
+    return list(range(below)) + list(range(above, len(landing_spots)))
+
+
+def get_return_segments(plan, range_key):
+    """
+    Find the calculate_return_segments segments of a finished calculate_ball_target result, building them on first use
+    :param plan: the trajectory plan from get_trajectory_plan
+    :param range_key: key of the finished result in plan["returns"]
+    """
+    segments = plan["segments"].get(range_key)
+    if segments is None:
+        segments = plan["segments"][range_key] = calculate_return_segments(plan["returns"][range_key])
+    return segments
+
+
+def returns_escape_paddle(return_segments, frames_before_return, return_distance, paddle_middle_y, paddle_height, table_height, ball_diameter):
+    """
+    Determine if any of the returns lands somewhere the paddle cannot hit in time
+    This is paddle_hit_ball_min_distance(...) > 0 for any return, but a segment whose highest or lowest landing spot is out of
+    reach even in the most time is decided from its ends, and otherwise only returns_out_of_reach are checked one by one
+    :param return_segments: segments from calculate_return_segments
+    :param frames_before_return: number of frames until the ball is hit back
+    :param return_distance: x distance the returned ball travels to the paddle
+    :param paddle_middle_y: y-coordinate of the paddle that has to reach the ball
+    :param paddle_height: height of the paddle
+    :param table_height: height of the table
+    :param ball_diameter: diameter of the ball
+    :return: True if at least one return cannot be hit
+    """
+    return_distance = abs(return_distance)
+    lowest_centre_y = paddle_height/2
+    highest_centre_y = table_height - paddle_height/2
+    hitting_slack = paddle_height/2 + ball_diameter/2
+    for segment in return_segments:
+        lowest_landing, highest_landing, slowest_x_speed = segment[0], segment[1], segment[2]
+        most_frames = frames_before_return + (return_distance / slowest_x_speed if slowest_x_speed != 0 else 10000)
+        if min(highest_centre_y, paddle_middle_y + most_frames) < highest_landing - hitting_slack \
+                or max(lowest_centre_y, paddle_middle_y - most_frames) > lowest_landing + hitting_slack:
+            return True
+        landing_spots, x_velocities = segment[5], segment[6]
+        for i in returns_out_of_reach(segment, frames_before_return, return_distance, paddle_middle_y, paddle_height, table_height, ball_diameter):
+            return_y_pos, return_x_velocity = landing_spots[i], x_velocities[i]
+            frames_until_impact = frames_before_return + (return_distance / abs(return_x_velocity) if return_x_velocity != 0 else 10000)
+            if min(highest_centre_y, paddle_middle_y + frames_until_impact) < return_y_pos - hitting_slack \
+                    or max(lowest_centre_y, paddle_middle_y - frames_until_impact) > return_y_pos + hitting_slack:
+                return True
+    return False
+
 
 def paddle_hit_ball_min_distance(frames_until_impact, ball_destination_y, paddle_middle_y, paddle_height, table_height, ball_diameter):
     """
@@ -0,0 +1,644 @@
+#   PongAIvAI
+#   Authors: Michael Guerzhoy and Denis Begun, 2014-2022.
+#   http://www.cs.toronto.edu/~guerzhoy/
+#   Email: guerzhoy at cs.toronto.edu
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version. You must credit the authors
+#   for the original parts of this code.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   Parts of the code are based on T. S. Hayden Dennison's PongClone (2011)
+#   http://www.pygame.org/project-PongClone-1740-3032.html
+
+'''
+Headless simulation core of PongAIvAI.
+
+Nothing in here imports pygame, so matches can be simulated on machines without a display (or without pygame
+installed at all). Rendering and keyboard input live in PongAIvAI.py, on top of this module.
+
+A bot is any object with two methods:
+
+    decide(paddle_frect, other_paddle_frect, ball_frect, table_size)  -> "up", "down" or None, called every frame
+    reset()                                                           -> called before every match
+
+so every instance keeps its own state. Plain move_getter functions (the original bot interface) still work: they are
+wrapped in a FunctionBot, whose reset() does nothing.
+'''
+
+import logging
+import random
+import math
+import threading
+import time
+
+
+log = logging.getLogger(__name__)
+
+
+def time_to_separate(frect, other_frect, velocity):
+    '''
+    How long frect, moving with velocity, takes until it no longer overlaps other_frect (math.inf if it never does).
+    Each axis separates independently, the first one to separate ends the overlap.
+    '''
+    t = math.inf
+    for i in range(2):
+        if velocity[i] > 0:
+            t = min(t, (other_frect.pos[i] + other_frect.size[i] - frect.pos[i])/velocity[i])
+        elif velocity[i] < 0:
+            t = min(t, (frect.pos[i] + frect.size[i] - other_frect.pos[i])/-velocity[i])
+    return max(0, t)
+
+
+class fRect:
+    '''
+    pygame's Rect class can only be used to represent whole integer vertices, so we create a rectangle class that can have floating point coordinates
+    '''
+    __slots__ = ('pos', 'size')
+
+    def __init__(self, pos, size):
+        self.pos = [pos[0], pos[1]]
+        self.size = (size[0], size[1])
+    def move(self, x, y):
+        return fRect((self.pos[0]+x, self.pos[1]+y), self.size)
+
+    def move_ip(self, x, y, move_factor = 1):
+        pos = self.pos
+        pos[0] += x*move_factor
+        pos[1] += y*move_factor
+
+    def get_rect(self):
+        # only needed by the drawing code, so pygame is imported lazily
+        from pygame import Rect
+        return Rect(self.pos, self.size)
+
+    def copy(self):
+        return fRect(self.pos, self.size)
+
+    def intersect(self, other_frect):
+        # two rectangles intersect iff both x and y projections intersect
+        for i in range(2):
+            if self.pos[i] < other_frect.pos[i]: # projection of self begins to the left
+                if other_frect.pos[i] >= self.pos[i] + self.size[i]:
+                    return 0
+            elif self.pos[i] > other_frect.pos[i]:
+                if self.pos[i] >= other_frect.pos[i] + other_frect.size[i]:
+                    return 0
+        return 1#self.size > 0 and other_frect.size > 0
+
+
+class FrozenRect:
+    '''
+    Read-only view of an fRect, handed to bots instead of a fresh copy of the rectangle every frame.
+
+    The view holds a tuple of the rectangle's position, not the rectangle: the engine writes the current position
+    into the same view object before every decide call (see update), so a bot that keeps the view sees it change. A
+    bot that wants to remember a position for the next frame keeps view.pos (or calls copy()). Nothing the bot does to
+    the view changes the game.
+    '''
+    __slots__ = ('pos', 'size')
+
+    def __init__(self, frect):
+        object.__setattr__(self, 'pos', (frect.pos[0], frect.pos[1]))
+        object.__setattr__(self, 'size', frect.size)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenRect is read-only")
+
+    def update(self, frect):
+        '''
+        Show frect's current position
+        '''
+        pos = frect.pos
+        object.__setattr__(self, 'pos', (pos[0], pos[1]))
+
+    def move(self, x, y):
+        return fRect((self.pos[0]+x, self.pos[1]+y), self.size)
+
+    def copy(self):
+        return fRect(self.pos, self.size)
+
+    def get_rect(self):
+        return self.copy().get_rect()
+
+    intersect = fRect.intersect
+
+
+class FunctionBot:
+    '''
+    Adapter that gives a legacy move_getter function the bot interface. Whatever state the function keeps (e.g. in
+    its own attributes) is shared by every paddle that uses it and is not cleared by reset()
+    '''
+    __slots__ = ('decide',)
+
+    def __init__(self, move_getter):
+        self.decide = move_getter
+
+    def reset(self):
+        pass
+
+
+def as_bot(move_getter):
+    '''
+    The bot interface of move_getter: bot objects are used as they are, functions are wrapped in a FunctionBot
+    '''
+    if hasattr(move_getter, 'decide'):
+        return move_getter
+    return FunctionBot(move_getter)
+
+
+class _BotWorker(threading.Thread):
+    '''
+    Persistent thread that runs one bot's calls for DeadlineBot. Requests and responses are handed over through
+    one preallocated slot and a pair of locks, so a call costs a lock handoff instead of starting a thread
+    '''
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+        self.request = threading.Lock()
+        self.request.acquire()
+        self.response = threading.Lock()
+        self.response.acquire()
+        self.call = None
+        self.result = None
+        self.error = None
+        self.busy = False
+        self.start()
+
+    def run(self):
+        while True:
+            self.request.acquire()
+            func, args = self.call
+            if func is None:
+                return
+            try:
+                self.result = func(*args)
+            except Exception as e:
+                self.error = e
+            self.response.release()
+
+    def call_with_deadline(self, func, args, time_limit):
+        '''
+        Run func(*args) on the worker and return (result, False), or (None, True) if it did not finish within
+        time_limit seconds. Calls made while the worker is still busy with a late call return (None, True) at once.
+        '''
+        if not self.wait(0):
+            return None, True
+
+        self.call = (func, args)
+        self.busy = True
+        self.request.release()
+        if not self.response.acquire(timeout=time_limit):
+            return None, True
+        self.busy = False
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        return self.result, False
+
+    def wait(self, timeout):
+        '''
+        Wait up to timeout seconds for a late call to finish and drop its result. Returns False if it is still running
+        '''
+        if self.busy:
+            if not self.response.acquire(timeout=timeout):
+                return False
+            self.error = None
+            self.busy = False
+        return True
+
+    def stop(self):
+        self.call = (None, ())
+        try:
+            self.request.release()
+        except RuntimeError:
+            pass  # the worker has not picked up the last request yet, it will find the stop request instead
+
+
+class DeadlineBot:
+    '''
+    Bot wrapper that enforces the per-frame time limit: a move that takes longer than time_limit seconds is dropped
+    ("no move", None) and counted in overruns.
+
+    By default the bot runs on the calling thread and a late answer is thrown away, which costs about a microsecond
+    per call but cannot stop a bot that never returns. With threaded=True the bot runs on its own persistent worker
+    thread, and the game stops waiting for it at the deadline (a lock handoff, ~15us per call). While the worker is
+    still busy with a late call, the following frames get None straight away. Call close() to stop the worker.
+    '''
+    def __init__(self, bot, time_limit, threaded=False):
+        self.bot = as_bot(bot)
+        self.time_limit = time_limit
+        self.calls = 0
+        self.overruns = 0
+        self.worker = _BotWorker() if threaded else None
+
+    def reset(self):
+        if self.worker is not None:
+            # a late call may still be running: let it finish (for at most a second) so it cannot undo the reset
+            self.worker.wait(1)
+            self.worker.call_with_deadline(self.bot.reset, (), 1)
+        else:
+            self.bot.reset()
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        self.calls += 1
+        if self.worker is None:
+            start = time.perf_counter()
+            direction = self.bot.decide(paddle_frect, other_paddle_frect, ball_frect, table_size)
+            late = time.perf_counter() - start > self.time_limit
+        else:
+            direction, late = self.worker.call_with_deadline(self.bot.decide, (paddle_frect, other_paddle_frect, ball_frect, table_size), self.time_limit)
+        if late:
+            self.overruns += 1
+            # log the 1st, 2nd, 4th, 8th, ... overrun, so a slow bot cannot flood the log
+            if self.overruns & (self.overruns - 1) == 0:
+                log.warning('%r took longer than %gs: %d of %d moves dropped so far', self.bot, self.time_limit, self.overruns, self.calls)
+            return None
+        return direction
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+
+
+class Paddle:
+    __slots__ = ('frect', 'speed', 'size', 'facing', 'max_angle', 'timeout', '_move_getter', 'bot', 'views')
+
+    def __init__(self, pos, size, speed, max_angle,  facing, timeout):
+        self.frect = fRect((pos[0]-size[0]/2, pos[1]-size[1]/2), size)
+        self.speed = speed
+        self.size = size
+        self.facing = facing
+        self.max_angle = max_angle
+        self.timeout = timeout
+        self.views = None
+
+    @property
+    def move_getter(self):
+        '''
+        The bot steering this paddle, as it was assigned: a bot object or a legacy move_getter function
+        '''
+        return self._move_getter
+
+    @move_getter.setter
+    def move_getter(self, move_getter):
+        self._move_getter = move_getter
+        self.bot = as_bot(move_getter)
+
+    def get_views(self, enemy_frect, ball_frect):
+        '''
+        Read-only views of (own, enemy, ball) rectangles for the bot, showing their current positions. The view objects
+        are only rebuilt when the enemy or ball rectangle object changes, which does not happen during a match
+        '''
+        views = self.views
+        if views is None or views[3] is not enemy_frect or views[4] is not ball_frect:
+            views = self.views = (FrozenRect(self.frect), FrozenRect(enemy_frect), FrozenRect(ball_frect), enemy_frect, ball_frect)
+        else:
+            views[0].update(self.frect)
+            views[1].update(enemy_frect)
+            views[2].update(ball_frect)
+        return views
+
+    def factor_accelerate(self, factor):
+        self.speed = factor*self.speed
+
+
+    def move(self, enemy_frect, ball_frect, table_size):
+        views = self.get_views(enemy_frect, ball_frect)
+        direction = self.bot.decide(views[0], views[1], views[2], table_size)
+        if direction == "up":
+            self.frect.move_ip(0, -self.speed)
+        elif direction == "down":
+            self.frect.move_ip(0, self.speed)
+
+        to_bottom = (self.frect.pos[1]+self.frect.size[1])-table_size[1]
+
+        if to_bottom > 0:
+            self.frect.move_ip(0, -to_bottom)
+        to_top = self.frect.pos[1]
+        if to_top < 0:
+            self.frect.move_ip(0, -to_top)
+
+
+    def get_face_pts(self):
+        return ((self.frect.pos[0] + self.frect.size[0]*self.facing, self.frect.pos[1]),
+                (self.frect.pos[0] + self.frect.size[0]*self.facing, self.frect.pos[1] + self.frect.size[1]-1)
+                )
+
+    def has_missed(self, ball):
+        '''
+        True once the ball has passed this paddle's face on its way out and the paddle can no longer reach it.
+        Wall bounces never turn the ball around, and the ball goes through the paddle once its centre is behind the
+        paddle's centre, so the point is then decided
+        '''
+        face_x = self.get_face_pts()[0][0]
+        centre_x = self.frect.pos[0] + self.frect.size[0]/2
+        if self.facing == 1:
+            if ball.speed[0] >= 0 or ball.frect.pos[0] >= face_x:
+                return False
+            frames_left = (ball.get_center()[0] - centre_x)/-ball.speed[0]
+        else:
+            if ball.speed[0] <= 0 or ball.frect.pos[0] + ball.frect.size[0] <= face_x:
+                return False
+            frames_left = (centre_x - ball.get_center()[0])/ball.speed[0]
+        if frames_left < 0:
+            return True
+
+        # otherwise the paddle must not be able to close the vertical gap before the ball's centre gets behind it
+        gap = max(self.frect.pos[1] - (ball.frect.pos[1] + ball.frect.size[1]),
+                  ball.frect.pos[1] - (self.frect.pos[1] + self.frect.size[1]))
+        closing_speed = self.speed + abs(ball.speed[1])*max(1, ball.wall_bounce*(1 + ball.dust_error))
+        return gap > closing_speed*(frames_left + 1)
+
+    def get_angle(self, y):
+        center = self.frect.pos[1]+self.size[1]/2
+        rel_dist_from_c = ((y-center)/self.size[1])
+        rel_dist_from_c = min(0.5, rel_dist_from_c)
+        rel_dist_from_c = max(-0.5, rel_dist_from_c)
+        sign = 1-2*self.facing
+
+        return sign*rel_dist_from_c*self.max_angle*math.pi/180
+
+
+
+
+
+class Ball:
+    __slots__ = ('frect', 'speed', 'size', 'paddle_bounce', 'wall_bounce', 'dust_error', 'init_speed_mag', 'prev_bounce', 'hits', 'rng')
+
+    def __init__(self, table_size, size, paddle_bounce, wall_bounce, dust_error, init_speed_mag, rng=None):
+        self.frect = fRect((0, 0), size)
+        # where serve angles and dust_error jitter come from: a random.Random of the match's own, or the global
+        # random module. A match with its own seeded Random plays the same way whatever else runs before or beside it
+        self.rng = random if rng is None else rng
+        self.size = size
+        self.paddle_bounce = paddle_bounce
+        self.wall_bounce = wall_bounce
+        self.dust_error = dust_error
+        self.init_speed_mag = init_speed_mag
+        # paddle hits that sped the ball up, over all points played with this ball
+        self.hits = 0
+        self.serve(table_size)
+
+    def serve(self, table_size):
+        '''
+        Put the ball back in the middle of the table with a new random direction, reusing this object
+        '''
+        rand_ang = (.4+.4*self.rng.random())*math.pi*(1-2*(self.rng.random()>.5))+.5*math.pi
+        #rand_ang = -110*math.pi/180
+        self.speed = (self.init_speed_mag*math.cos(rand_ang), self.init_speed_mag*math.sin(rand_ang))
+        #pos = (table_size[0]/2 - 181, table_size[1]/2 - 105)
+        self.frect.pos[0] = table_size[0]/2 - self.size[0]/2
+        self.frect.pos[1] = table_size[1]/2 - self.size[1]/2
+        self.prev_bounce = None
+
+    def get_center(self):
+        return (self.frect.pos[0] + .5*self.frect.size[0], self.frect.pos[1] + .5*self.frect.size[1])
+
+
+    def get_speed_mag(self):
+        return math.sqrt(self.speed[0]**2+self.speed[1]**2)
+
+    def factor_accelerate(self, factor):
+        self.speed = (factor*self.speed[0], factor*self.speed[1])
+
+
+
+    def time_to_wall(self, velocity, table_size):
+        '''
+        How long until the ball moving with velocity touches the top or bottom wall (0 if it is already in it)
+        '''
+        if velocity[1] < 0:
+            return max(0, self.frect.pos[1]/-velocity[1])
+        if velocity[1] > 0:
+            return max(0, (table_size[1] - self.frect.size[1] - self.frect.pos[1])/velocity[1])
+        return math.inf
+
+    def time_to_hit(self, paddle, max_time):
+        '''
+        Swept test of the ball, moving with its current speed, against paddle. Returns the time (in frames) at which
+        the ball starts touching the front of the paddle, or None if that does not happen within max_time
+        '''
+        t_enter, t_exit = -math.inf, math.inf
+        for i in range(2):
+            near = paddle.frect.pos[i] - (self.frect.pos[i] + self.frect.size[i])
+            far = paddle.frect.pos[i] + paddle.frect.size[i] - self.frect.pos[i]
+            if self.speed[i] > 0:
+                t_enter, t_exit = max(t_enter, near/self.speed[i]), min(t_exit, far/self.speed[i])
+            elif self.speed[i] < 0:
+                t_enter, t_exit = max(t_enter, far/self.speed[i]), min(t_exit, near/self.speed[i])
+            elif not near < 0 < far:
+                return None
+        if t_enter >= t_exit or t_exit <= 0 or t_enter >= max_time:
+            return None
+        t = max(0, t_enter)
+
+        # same rule as in move(): a ball that is already behind the paddle's centre goes through
+        centre_x = self.frect.pos[0] + .5*self.frect.size[0] + t*self.speed[0]
+        if (paddle.facing == 1 and centre_x < paddle.frect.pos[0] + paddle.frect.size[0]/2) or \
+        (paddle.facing == 0 and centre_x > paddle.frect.pos[0] + paddle.frect.size[0]/2):
+            return None
+        return t
+
+    def bounce_off_wall(self):
+        r1 = 1+2*(self.rng.random()-.5)*self.dust_error
+        r2 = 1+2*(self.rng.random()-.5)*self.dust_error
+
+        self.speed = (self.wall_bounce*self.speed[0]*r1, -self.wall_bounce*self.speed[1]*r2)
+
+    def bounce_off(self, paddle):
+        '''
+        Reflect the ball's velocity off paddle, at the angle given by where the ball's centre is on the paddle
+        '''
+        theta = paddle.get_angle(self.frect.pos[1]+.5*self.frect.size[1])
+
+
+        v = self.speed
+
+        v = [math.cos(theta)*v[0]-math.sin(theta)*v[1],
+                     math.sin(theta)*v[0]+math.cos(theta)*v[1]]
+
+        v[0] = -v[0]
+
+        v = [math.cos(-theta)*v[0]-math.sin(-theta)*v[1],
+                      math.cos(-theta)*v[1]+math.sin(-theta)*v[0]]
+
+
+        # Bona fide hack: enforce a lower bound on horizontal speed and disallow back reflection
+        if  v[0]*(2*paddle.facing-1) < 1: # ball is not traveling (a) away from paddle (b) at a sufficient speed
+            v[1] = (v[1]/abs(v[1]))*math.sqrt(v[0]**2 + v[1]**2 - 1) # transform y velocity so as to maintain the speed
+            v[0] = (2*paddle.facing-1) # note that minimal horiz speed will be lower than we're used to, where it was 0.95 prior to increase by *1.2
+
+        #a bit hacky, prevent multiple bounces from accelerating
+        #the ball too much
+        if not paddle is self.prev_bounce:
+            self.speed = (v[0]*self.paddle_bounce, v[1]*self.paddle_bounce)
+            self.hits += 1
+        else:
+            self.speed = (v[0], v[1])
+        self.prev_bounce = paddle
+
+    def move(self, paddles, table_size, move_factor):
+        moved = 0
+
+        # The ball is in a wall when its rectangle, truncated like a pygame.Rect, overlaps the wall
+        in_top_wall = int(self.frect.pos[1]) < 0
+        in_bottom_wall = int(self.frect.pos[1]) + int(self.frect.size[1]) > table_size[1]
+        if (in_top_wall and self.speed[1] < 0) or (in_bottom_wall and self.speed[1] > 0):
+            # The ball's edge crossed the wall some time ago (in units of this sub-step): go back to the point of
+            # impact, bounce, and travel the same time with the new velocity
+            wall_y = 0 if in_top_wall else table_size[1] - self.frect.size[1]
+            t = (self.frect.pos[1] - wall_y)/(self.speed[1]*move_factor)
+            self.frect.move_ip(-t*self.speed[0], -t*self.speed[1], move_factor)
+
+            self.bounce_off_wall()
+            self.frect.move_ip(t*self.speed[0], t*self.speed[1], move_factor)
+            moved = 1
+
+        for paddle in paddles:
+            if self.frect.intersect(paddle.frect):
+                if (paddle.facing == 1 and self.get_center()[0] < paddle.frect.pos[0] + paddle.frect.size[0]/2) or \
+                (paddle.facing == 0 and self.get_center()[0] > paddle.frect.pos[0] + paddle.frect.size[0]/2):
+                    continue
+
+                # Time of impact: how far back along the incoming velocity the ball stopped overlapping the paddle,
+                # but never further back than a wall
+                backwards = (-self.speed[0]*move_factor, -self.speed[1]*move_factor)
+                t = min(time_to_separate(self.frect, paddle.frect, backwards), self.time_to_wall(backwards, table_size))
+                if t == math.inf:
+                    t = 0
+                self.frect.move_ip(-t*self.speed[0], -t*self.speed[1], move_factor)
+
+                self.bounce_off(paddle)
+
+                # travel the same time forward with the new velocity, and further if that is not enough to leave the paddle
+                self.frect.move_ip(t*self.speed[0], t*self.speed[1], move_factor)
+                if self.frect.intersect(paddle.frect):
+                    t = time_to_separate(self.frect, paddle.frect, (self.speed[0]*move_factor, self.speed[1]*move_factor))
+                    if t != math.inf:
+                        self.frect.move_ip(t*self.speed[0], t*self.speed[1], move_factor)
+
+                moved = 1
+
+        # a paddle bounce close to a wall can leave the ball inside the wall; the wall check above bounces it back
+        # out on the next sub-step
+
+        if not moved:
+            self.frect.move_ip(self.speed[0], self.speed[1], move_factor)
+            #print "moving "
+        #print "poition: ", self.frect.pos
+
+
+    def sweep(self, paddles, table_size, max_bounces=16):
+        '''
+        Continuous collision mode: move the ball through a whole frame at once. Every iteration finds the earliest
+        wall or paddle contact in the rest of the frame, moves the ball exactly there and bounces, so the cost
+        depends on the number of bounces in the frame and not on the ball's speed
+        '''
+        time_left = 1.
+        for _ in range(max_bounces):
+            hit, t = None, time_left
+            t_wall = self.time_to_wall(self.speed, table_size)
+            if t_wall < t:
+                hit, t = 'wall', t_wall
+            for paddle in paddles:
+                t_paddle = self.time_to_hit(paddle, t)
+                if t_paddle is not None:
+                    hit, t = paddle, t_paddle
+
+            self.frect.move_ip(self.speed[0], self.speed[1], t)
+            time_left -= t
+            if hit is None:
+                return
+            if hit == 'wall':
+                self.bounce_off_wall()
+            else:
+                self.bounce_off(hit)
+
+        # only reachable if the ball is stuck between a paddle and a wall, just finish the frame
+        self.frect.move_ip(self.speed[0], self.speed[1], time_left)
+
+
+def check_point(score, ball, table_size, paddles=None):
+    '''
+    Award a point once the ball's centre has left the table. If paddles are given, also award it as soon as one of
+    them has certainly missed the ball (early adjudication), which saves simulating the rest of the point. Either
+    paddle can be None to only adjudicate the other one
+    '''
+    if ball.frect.pos[0]+ball.size[0]/2 < 0 or (paddles and paddles[0] is not None and paddles[0].has_missed(ball)):
+        score[1] += 1
+        ball.serve(table_size)
+        return (ball, score)
+    elif ball.frect.pos[0]+ball.size[0]/2 >= table_size[0] or (paddles and paddles[1] is not None and paddles[1].has_missed(ball)):
+        ball.serve(table_size)
+        score[0] += 1
+        return (ball, score)
+
+    return (ball, score)
+
+
+def new_match(table_size, paddle_size, ball_size, paddle_speed, max_angle, paddle_bounce, wall_bounce, dust_error, init_speed_mag, timeout, rng=None):
+    '''
+    Paddles and ball for a fresh match, set up the same way as in init_game. Takes the physics configuration as keywords,
+    and optionally the match's own random.Random (see Ball)
+    '''
+    paddles = [Paddle((20, table_size[1]/2), paddle_size, paddle_speed, max_angle,  1, timeout),
+               Paddle((table_size[0]-20, table_size[1]/2), paddle_size, paddle_speed, max_angle, 0, timeout)]
+    ball = Ball(table_size, ball_size, paddle_bounce, wall_bounce, dust_error, init_speed_mag, rng)
+    return paddles, ball
+
+
+def step(paddles, ball, table_size, swept=False):
+    '''
+    Advance the game by one frame: both bots pick a direction, then the ball moves in int(|speed|) sub-steps, or in
+    a single swept move with swept=True
+    '''
+    paddles[0].move(paddles[1].frect, ball.frect, table_size)
+    paddles[1].move(paddles[0].frect, ball.frect, table_size)
+
+    if swept:
+        ball.sweep(paddles, table_size)
+        return
+
+    inv_move_factor = int((ball.speed[0]**2+ball.speed[1]**2)**.5)
+    if inv_move_factor > 0:
+        for i in range(inv_move_factor):
+            ball.move(paddles, table_size, 1./inv_move_factor)
+    else:
+        ball.move(paddles, table_size, 1)
+
+
+def game_loop(paddles, ball, table_size, score_to_win, swept=False, adjudicate=False, stats=None):
+    '''
+    Play a headless match until one side reaches score_to_win and return the final [left, right] score.
+    With adjudicate=True a point that ends the match ends as soon as a paddle has certainly missed the ball (see
+    Paddle.has_missed), so the final score is the same as without it. Other points are always played out: the
+    frames skipped would still have moved the paddles and drawn random numbers, which changes the points after it.
+    If stats is a dict, the number of frames played and of paddle hits are stored in it as 'frames' and 'hits'
+    '''
+    score = [0, 0]
+    frames = 0
+    hits = ball.hits
+    table_size = tuple(table_size)  # bots get this object every frame, so it must not be mutable
+    for paddle in paddles:
+        paddle.bot.reset()
+
+    judged = None
+    while max(score) < score_to_win:
+        if adjudicate:
+            # the paddle whose miss would end the match
+            judged = (paddles[0] if score[1] + 1 >= score_to_win else None, paddles[1] if score[0] + 1 >= score_to_win else None)
+        ball, score = check_point(score, ball, table_size, judged)
+        step(paddles, ball, table_size, swept)
+        frames += 1
+
+    if stats is not None:
+        stats['frames'] = frames
+        stats['hits'] = ball.hits - hits
+    return score
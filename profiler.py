@@ -0,0 +1,211 @@
+'''
+Opt-in latency profiler for PongAIvAI bots.
+
+A Profile collects one LatencyHistogram per bot (every decide() call) and per instrumented helper function (every
+call, including the time spent in the helpers it calls itself). Nothing in the engine changes when profiling is off:
+bots are only timed if they are wrapped with Profile.wrap, and helpers only while Profile.instrumented() patches them
+into their module.
+
+Histograms have a fixed number of logarithmic buckets (8 per power of two, so about 9% wide), which keeps recording
+O(1) and lets the histograms of every tournament worker be added up. Percentiles are reported as the upper edge of
+their bucket.
+
+    profile = profiler.Profile(budget=0.0003)
+    profile.instrument('pong_ai_new', 'calculate_ball_target', 'calculate_landing_spot', 'paddle_hit_ball_min_distance')
+    tournament.run_tournament((pong_ai_new.PongAI(), pong_ai.PongAI()), 100, profile=profile)
+    print(profile.report())
+'''
+
+import contextlib
+import functools
+import importlib
+import time
+
+import pong_engine
+
+
+# values below 16ns get a bucket each, then every power of two is split into 8 buckets
+EXACT_BUCKETS = 16
+SUB_BUCKETS = 8
+N_BUCKETS = EXACT_BUCKETS + (64 - 4)*SUB_BUCKETS
+
+
+def bucket_index(ns):
+    if ns < EXACT_BUCKETS:
+        return max(0, ns)
+    exponent = ns.bit_length() - 1
+    return EXACT_BUCKETS + (exponent - 4)*SUB_BUCKETS + ((ns >> (exponent - 3)) & (SUB_BUCKETS - 1))
+
+
+def bucket_lower_bound(index):
+    if index < EXACT_BUCKETS:
+        return index
+    exponent, sub = divmod(index - EXACT_BUCKETS, SUB_BUCKETS)
+    return (SUB_BUCKETS + sub) << (exponent + 1)
+
+
+class LatencyHistogram:
+    '''
+    Log-bucketed histogram of call durations in nanoseconds, with the exact count, total and maximum, and the number
+    of calls that took longer than budget_ns (if given)
+    '''
+    __slots__ = ('counts', 'count', 'total', 'max', 'budget_ns', 'over_budget')
+
+    def __init__(self, budget_ns=None):
+        self.counts = [0]*N_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.budget_ns = budget_ns
+        self.over_budget = 0
+
+    def record(self, ns):
+        self.counts[bucket_index(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        if self.budget_ns is not None and ns > self.budget_ns:
+            self.over_budget += 1
+
+    def merge(self, other):
+        counts = self.counts
+        for i, n in enumerate(other.counts):
+            if n:
+                counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.over_budget += other.over_budget
+
+    def percentile(self, q):
+        '''
+        Upper edge of the bucket holding the q-th quantile (0 < q <= 1), capped at the maximum
+        '''
+        if self.count == 0:
+            return 0
+        rank = q*self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.max, bucket_lower_bound(i + 1))
+        return self.max
+
+
+class ProfiledBot:
+    '''
+    Bot wrapper that records how long every decide() call takes
+    '''
+    def __init__(self, bot, histogram):
+        self.bot = bot
+        self.histogram = histogram
+
+    def reset(self):
+        self.bot.reset()
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        start = time.perf_counter_ns()
+        direction = self.bot.decide(paddle_frect, other_paddle_frect, ball_frect, table_size)
+        self.histogram.record(time.perf_counter_ns() - start)
+        return direction
+
+
+def bot_name(bot):
+    '''
+    Name a bot is profiled under: its module and class, or module and function name for move_getter functions
+    '''
+    if not hasattr(bot, '__qualname__'):
+        bot = type(bot)
+    return '%s.%s' % (bot.__module__, bot.__qualname__)
+
+
+def timed(func, histogram):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.record(time.perf_counter_ns() - start)
+    return wrapper
+
+
+class Profile:
+    '''
+    Latency histograms of bots and helper functions, by name. budget is the per-move time limit in seconds that bot
+    calls are checked against (None: don't count violations)
+    '''
+    def __init__(self, budget=None):
+        self.budget_ns = None if budget is None else int(budget*1e9)
+        self.bots = {}
+        self.functions = {}
+        # (module name, function name) pairs that instrumented() patches
+        self.targets = []
+
+    def wrap(self, bot, name=None):
+        '''
+        A bot that behaves like bot and records its decide() calls under name (default: bot_name(bot))
+        '''
+        name = bot_name(bot) if name is None else name
+        if name not in self.bots:
+            self.bots[name] = LatencyHistogram(self.budget_ns)
+        return ProfiledBot(pong_engine.as_bot(bot), self.bots[name])
+
+    def instrument(self, module_name, *function_names):
+        '''
+        Also time calls of these module level functions while instrumented() is active
+        '''
+        for function_name in function_names:
+            self.targets.append((module_name, function_name))
+
+    @contextlib.contextmanager
+    def instrumented(self):
+        '''
+        Replace the instrumented functions by timed wrappers in their modules (bots look helpers up in their module
+        globals, so every call is seen), and put the originals back afterwards
+        '''
+        originals = []
+        try:
+            for module_name, function_name in self.targets:
+                module = importlib.import_module(module_name)
+                name = '%s.%s' % (module_name, function_name)
+                if name not in self.functions:
+                    self.functions[name] = LatencyHistogram()
+                func = getattr(module, function_name)
+                originals.append((module, function_name, func))
+                setattr(module, function_name, timed(func, self.functions[name]))
+            yield self
+        finally:
+            for module, function_name, func in reversed(originals):
+                setattr(module, function_name, func)
+
+    def copy_empty(self):
+        '''
+        A Profile with the same budget and targets but no calls yet, e.g. to fill in a worker process
+        '''
+        profile = Profile()
+        profile.budget_ns = self.budget_ns
+        profile.targets = list(self.targets)
+        return profile
+
+    def merge(self, other):
+        for mine, theirs in ((self.bots, other.bots), (self.functions, other.functions)):
+            for name, histogram in theirs.items():
+                if name in mine:
+                    mine[name].merge(histogram)
+                else:
+                    mine[name] = histogram
+
+    def report(self):
+        '''
+        Table of calls, mean, p50, p99 and max (in microseconds), and budget violations of every bot and function
+        '''
+        lines = ['%-45s %10s %9s %9s %9s %9s %10s' % ('', 'calls', 'mean', 'p50', 'p99', 'max', 'over')]
+        for histograms in (self.bots, self.functions):
+            for name, h in sorted(histograms.items()):
+                over = '' if h.budget_ns is None else '%d' % h.over_budget
+                lines.append('%-45s %10d %9.1f %9.1f %9.1f %9.1f %10s' % (
+                    name, h.count, h.total/max(1, h.count)/1000, h.percentile(0.5)/1000, h.percentile(0.99)/1000,
+                    h.max/1000, over))
+        return '\n'.join(lines)
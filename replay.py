@@ -0,0 +1,226 @@
+'''
+Compact binary replays of PongAIvAI matches.
+
+A match played with a seed is fully determined by the seed, the physics configuration and the directions the bots
+chose, so a replay only stores those: one byte per frame with both paddles' directions (2 bits each). Every
+keyframe_interval frames it also stores a keyframe with the complete state (paddles, ball, score, and how many random
+numbers the match has drawn), so seeking to any frame only re-simulates at most keyframe_interval frames. Replaying
+never calls a bot: the recorded directions are played back through the normal engine.
+
+File layout (little endian):
+
+    header     magic, version, number of frames, number of keyframes, keyframe interval, final score, JSON length
+    JSON       seed, physics configuration, score_to_win, swept, bot names (padded to 8 bytes)
+    keyframes  KEYFRAME records
+    frames     one byte per frame: left direction | right direction << 2 (0: no move, 1: up, 2: down)
+
+Replay memory-maps the keyframes and frames as numpy arrays, so thousands of replays can be scanned without turning
+their frames into Python objects, e.g. the fraction of frames in which the left paddle moved:
+
+    frames = replay.Replay(path).frames
+    moving = np.count_nonzero(frames & 3)/len(frames)
+'''
+
+import json
+import random
+import struct
+import sys
+
+import numpy as np
+
+import pong_engine
+import profiler
+import tournament
+
+
+MAGIC = b'PONGRPL1'
+VERSION = 1
+# magic, version, frames, keyframes, keyframe interval, left score, right score, JSON length
+HEADER = struct.Struct('<8sIIIIHHI')
+KEYFRAME = np.dtype([('frame', '<u4'), ('draws', '<u4'), ('hits', '<u4'), ('score', '<u2', 2), ('prev_bounce', 'i1'), ('pad', 'V7'),
+                     ('paddle_y', '<f8', 2), ('ball_pos', '<f8', 2), ('ball_speed', '<f8', 2)])
+DEFAULT_KEYFRAME_INTERVAL = 256
+DIRECTION_CODES = {'up': 1, 'down': 2}
+DIRECTIONS = (None, 'up', 'down', None)
+
+
+class CountingRandom(random.Random):
+    '''
+    random.Random that counts its draws, so that a keyframe can bring a fresh one to the same state
+    '''
+    def __init__(self, seed):
+        self.draws = 0
+        random.Random.__init__(self, seed)
+
+    def random(self):
+        self.draws += 1
+        return random.Random.random(self)
+
+    def restore(self, seed, draws):
+        self.seed(seed)
+        for _ in range(draws):
+            random.Random.random(self)
+        self.draws = draws
+
+
+class RecordingBot:
+    '''
+    Bot wrapper that remembers the code of the direction its bot chose last
+    '''
+    def __init__(self, bot):
+        self.bot = pong_engine.as_bot(bot)
+        self.code = 0
+
+    def reset(self):
+        self.bot.reset()
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        direction = self.bot.decide(paddle_frect, other_paddle_frect, ball_frect, table_size)
+        self.code = DIRECTION_CODES.get(direction, 0) if isinstance(direction, str) else 0
+        return direction
+
+
+class ReplayBot:
+    '''
+    Plays one paddle's recorded directions back, starting at frame
+    '''
+    def __init__(self, frames, shift, frame=0):
+        self.frames = frames
+        self.shift = shift
+        self.frame = frame
+
+    def reset(self):
+        pass
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        code = (int(self.frames[self.frame]) >> self.shift) & 3
+        self.frame += 1
+        return DIRECTIONS[code]
+
+
+def keyframe(frame, paddles, ball, score):
+    return (frame, ball.rng.draws, ball.hits, tuple(score), -1 if ball.prev_bounce is None else paddles.index(ball.prev_bounce), b'',
+            (paddles[0].frect.pos[1], paddles[1].frect.pos[1]), tuple(ball.frect.pos), ball.speed)
+
+
+def record_match(left_bot, right_bot, path, config=None, score_to_win=1, seed=None, swept=False,
+                 keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+    '''
+    Play a headless match like pong_engine.game_loop, write its replay to path and return the final [left, right]
+    score. Without a seed, a random one is picked (and stored)
+    '''
+    config = dict(tournament.DEFAULT_CONFIG if config is None else config)
+    if seed is None:
+        seed = random.getrandbits(63)
+    paddles, ball = pong_engine.new_match(**config, rng=CountingRandom(seed))
+    bots = [RecordingBot(left_bot), RecordingBot(right_bot)]
+    paddles[0].move_getter, paddles[1].move_getter = bots
+    table_size = tuple(config['table_size'])
+
+    score = [0, 0]
+    frames = bytearray()
+    keyframes = []
+    for bot in bots:
+        bot.reset()
+    while max(score) < score_to_win:
+        if len(frames) % keyframe_interval == 0:
+            keyframes.append(keyframe(len(frames), paddles, ball, score))
+        ball, score = pong_engine.check_point(score, ball, table_size)
+        pong_engine.step(paddles, ball, table_size, swept)
+        frames.append(bots[0].code | bots[1].code << 2)
+
+    description = json.dumps({'seed': seed, 'config': config, 'score_to_win': score_to_win, 'swept': swept,
+                              'bots': [profiler.bot_name(left_bot), profiler.bot_name(right_bot)]}).encode()
+    description += b' '*(-(HEADER.size + len(description)) % 8)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(frames), len(keyframes), keyframe_interval, score[0], score[1], len(description)))
+        f.write(description)
+        f.write(np.array(keyframes, dtype=KEYFRAME).tobytes())
+        f.write(frames)
+    return score
+
+
+class Replay:
+    '''
+    A replay file, memory-mapped. frames and keyframes are read-only numpy arrays backed by the file
+    '''
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError('%s is not a replay' % path)
+            magic, version, n_frames, n_keyframes, self.keyframe_interval, left, right, description_length = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('%s is not a version %d replay' % (path, VERSION))
+            description = json.loads(f.read(description_length).decode())
+        self.path = path
+        self.score = [left, right]
+        self.seed = description['seed']
+        self.config = description['config']
+        self.config['table_size'] = tuple(self.config['table_size'])
+        self.score_to_win = description['score_to_win']
+        self.swept = description['swept']
+        self.bots = description['bots']
+
+        offset = HEADER.size + description_length
+        self.keyframes = np.memmap(path, dtype=KEYFRAME, mode='r', offset=offset, shape=(n_keyframes,))
+        offset += n_keyframes*KEYFRAME.itemsize
+        # np.memmap cannot map an empty array
+        self.frames = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(n_frames,)) if n_frames else np.zeros(0, np.uint8)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def directions(self, frame):
+        '''
+        (left, right) directions the bots chose in frame
+        '''
+        code = int(self.frames[frame])
+        return DIRECTIONS[code & 3], DIRECTIONS[code >> 2 & 3]
+
+    def state_at(self, frame):
+        '''
+        (paddles, ball, score) after the first frame frames, restored from the last keyframe before it and played on
+        from there. The paddles play the rest of the replay if the match is continued with pong_engine.step
+        '''
+        frame = max(0, min(frame, len(self.frames)))
+        k = self.keyframes[min(frame//self.keyframe_interval, len(self.keyframes) - 1)]
+        start = int(k['frame'])
+
+        rng = CountingRandom(self.seed)
+        paddles, ball = pong_engine.new_match(**self.config, rng=rng)
+        rng.restore(self.seed, int(k['draws']))
+        for paddle, y in zip(paddles, k['paddle_y']):
+            paddle.frect.pos[1] = float(y)
+        ball.frect.pos[0], ball.frect.pos[1] = (float(v) for v in k['ball_pos'])
+        ball.speed = tuple(float(v) for v in k['ball_speed'])
+        ball.prev_bounce = None if k['prev_bounce'] < 0 else paddles[int(k['prev_bounce'])]
+        ball.hits = int(k['hits'])
+        score = [int(v) for v in k['score']]
+        paddles[0].move_getter = ReplayBot(self.frames, 0, start)
+        paddles[1].move_getter = ReplayBot(self.frames, 2, start)
+
+        for _ in range(start, frame):
+            ball, score = pong_engine.check_point(score, ball, self.config['table_size'])
+            pong_engine.step(paddles, ball, self.config['table_size'], self.swept)
+        return paddles, ball, score
+
+    def iter_states(self, start=0):
+        '''
+        Yield (frame, paddles, ball, score) for every frame from start to the end, re-simulating each one once.
+        The objects are updated in place
+        '''
+        paddles, ball, score = self.state_at(start)
+        table_size = self.config['table_size']
+        for frame in range(start, len(self.frames)):
+            yield frame, paddles, ball, score
+            ball, score = pong_engine.check_point(score, ball, table_size)
+            pong_engine.step(paddles, ball, table_size, self.swept)
+        yield len(self.frames), paddles, ball, score
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        replay = Replay(path)
+        print('%s: %s vs %s, %d frames, final score %d:%d, seed %s' % (path, replay.bots[0], replay.bots[1], len(replay),
+                                                                       replay.score[0], replay.score[1], replay.seed))
@@ -0,0 +1,140 @@
+'''
+Offline export of replays (see replay.py) to image frames or a video.
+
+Frames are drawn with PongAIvAI.draw onto an offscreen Surface, so no window is opened (SDL's dummy video driver is
+selected) and nothing waits for the clock: a match renders as fast as the CPU allows. The frames of every replay are
+split into ranges of CHUNK_FRAMES that are rendered by a process pool; each range starts from the replay's nearest
+keyframe, so workers never re-simulate the match from the beginning.
+
+    python replay_export.py rally.rpl -o frames                  # frames/rally/000000.tga, ...
+    python replay_export.py *.rpl -o frames --every 2 --video    # also frames/<replay>.mp4, at 40 fps
+
+Frames are saved as TGA by default: it is lossless and run-length encoded, which for a mostly black table makes files
+almost as small as PNG while saving them takes about a tenth of the time (PNG compression is most of the cost of a
+frame). Videos are encoded from the frames with ffmpeg, which has to be on the PATH.
+'''
+
+import os
+
+# must be set before pygame initializes its display, also in the worker processes
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import multiprocessing
+import shutil
+import subprocess
+import sys
+
+import pygame
+
+import PongAIvAI
+import replay
+
+
+# output frames rendered per task
+CHUNK_FRAMES = 256
+FRAME_NAME = '%06d.'
+FORMATS = ('tga', 'png', 'bmp', 'jpg')
+# frames per second of the display mode (clock_rate in init_game)
+DEFAULT_FPS = 80
+
+
+def export_range(task):
+    '''
+    Render the output frames first to last - 1 of a replay (output frame i is simulated frame start + i*every) into
+    out_dir and return how many were written
+    '''
+    path, out_dir, start, every, first, last, image_format = task
+    if not pygame.font.get_init():
+        pygame.font.init()
+    recorded = replay.Replay(path)
+    table_size = recorded.config['table_size']
+    surface = pygame.Surface(table_size)
+
+    written = 0
+    index = first
+    target = start + first*every
+    for frame, paddles, ball, score in recorded.iter_states(target):
+        if frame < target:
+            continue
+        PongAIvAI.draw(surface, paddles, ball, score, table_size)
+        pygame.image.save(surface, os.path.join(out_dir, FRAME_NAME % index + image_format))
+        written += 1
+        index += 1
+        if index >= last:
+            break
+        target += every
+    return written
+
+
+def export_tasks(path, out_dir, start=0, end=None, every=1, image_format='tga'):
+    '''
+    Tasks of export_range that render every every-th frame of the replay at path from start to end (default: its
+    last frame) into out_dir, as image_format files
+    '''
+    n_frames = len(replay.Replay(path)) + 1  # the final position is shown too
+    end = n_frames if end is None else min(end, n_frames)
+    n_out = max(0, (end - start + every - 1)//every)
+    return [(path, out_dir, start, every, first, min(first + CHUNK_FRAMES, n_out), image_format) for first in range(0, n_out, CHUNK_FRAMES)]
+
+
+def encode_video(frames_dir, video_path, fps=DEFAULT_FPS, image_format='tga'):
+    '''
+    Encode the frames exported into frames_dir as video_path with ffmpeg
+    '''
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError('ffmpeg is needed to encode videos, the frames are in %s' % frames_dir)
+    subprocess.run([ffmpeg, '-loglevel', 'error', '-y', '-framerate', str(fps), '-i', os.path.join(frames_dir, FRAME_NAME + image_format),
+                    '-pix_fmt', 'yuv420p', video_path], check=True)
+
+
+def export(paths, out_dir, start=0, end=None, every=1, processes=None, video=False, fps=None, image_format='tga'):
+    '''
+    Render the replays at paths to out_dir/<replay name>/ on a process pool and, with video=True, encode each as
+    out_dir/<replay name>.mp4, at fps frames per second (default: real time). Returns the number of frames written
+    '''
+    fps = DEFAULT_FPS/every if fps is None else fps
+    tasks = []
+    frame_dirs = []
+    for path in paths:
+        frames_dir = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0])
+        os.makedirs(frames_dir, exist_ok=True)
+        frame_dirs.append(frames_dir)
+        tasks += export_tasks(path, frames_dir, start, end, every, image_format)
+
+    if processes == 1 or len(tasks) <= 1:
+        written = sum(map(export_range, tasks))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            written = sum(pool.imap_unordered(export_range, tasks))
+
+    if video:
+        for frames_dir in frame_dirs:
+            encode_video(frames_dir, frames_dir + '.mp4', fps, image_format)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render PongAIvAI replays to image frames or videos, offscreen')
+    parser.add_argument('replays', nargs='+', help='replay files written by replay.record_match')
+    parser.add_argument('-o', '--output', default='frames', help='directory for the frames (default: frames)')
+    parser.add_argument('--start', type=int, default=0, help='first frame to render')
+    parser.add_argument('--end', type=int, help='render up to this frame (default: the end of the match)')
+    parser.add_argument('--every', type=int, default=1, help='render every n-th frame')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='tga', help='image format of the frames (default: tga)')
+    parser.add_argument('-j', '--processes', type=int, help='worker processes (default: one per core)')
+    parser.add_argument('--video', action='store_true', help='also encode every replay as an mp4 video with ffmpeg')
+    parser.add_argument('--fps', type=float, help='frames per second of the videos (default: real time)')
+    args = parser.parse_args(argv)
+    if args.every < 1:
+        parser.error('--every must be at least 1')
+
+    written = export(args.replays, args.output, args.start, args.end, args.every, args.processes, args.video, args.fps, args.format)
+    print('%d frames written to %s' % (written, args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+'''
+Persistent store of tournament results, so that running the same matchup again only plays the games that are new.
+
+Results are stored per side-swapped pair, under a matchup key that hashes everything a seeded pair's result depends on:
+
+- the source file of the module that defines each bot, its name and its pickled settings (see bot_fingerprint)
+- the files every match depends on: the engine (pong_engine.py, see DEPENDENCIES)
+- the physics configuration (everything in the config except the timeout)
+- score_to_win and the tournament seed
+
+Changing one bot or one constant gives new keys for exactly the matchups it is part of, so in a round robin only
+those are played again, and changing the engine gives new keys for every matchup. A bot that depends on other code
+outside its own module (e.g. a helper module or a data file of its own) has to be changed in its own module too, or
+the cache cleared, for the change to be noticed.
+
+The store is an SQLite database (results_cache.sqlite next to the bots by default), so several tournaments can share
+it.
+'''
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(DIRECTORY, 'results_cache.sqlite')
+# files besides the bots' own modules that seeded results depend on. A missing file is part of the key too
+DEPENDENCIES = [os.path.join(DIRECTORY, name) for name in ('pong_engine.py',)]
+# bump to drop every cached result, e.g. after a change to the engine
+VERSION = 2
+# finished pairs are written to disk in batches of this many
+COMMIT_EVERY = 64
+
+
+def bot_fingerprint(bot):
+    '''
+    Hash of the source file of the module that defines bot (a bot object or move_getter function), the bot's
+    qualified name and its pickled state
+    '''
+    target = bot if hasattr(bot, '__qualname__') else type(bot)
+    digest = hashlib.sha256()
+    module_file = getattr(sys.modules.get(target.__module__), '__file__', None)
+    if module_file is not None:
+        with open(module_file, 'rb') as f:
+            digest.update(f.read())
+    digest.update(('%s.%s' % (target.__module__, target.__qualname__)).encode())
+    digest.update(pickle.dumps(bot, protocol=4))
+    return digest.hexdigest()
+
+
+def dependencies_fingerprint():
+    '''
+    Hash of the contents of the files in DEPENDENCIES
+    '''
+    digest = hashlib.sha256()
+    for path in DEPENDENCIES:
+        digest.update(os.path.basename(path).encode())
+        try:
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        except FileNotFoundError:
+            digest.update(b'missing')
+    return digest.hexdigest()
+
+
+def matchup_key(bots, config, score_to_win, seed):
+    description = {
+        'version': VERSION,
+        'dependencies': dependencies_fingerprint(),
+        'bots': [bot_fingerprint(bot) for bot in bots],
+        'config': {name: value for name, value in config.items() if name != 'timeout'},
+        'score_to_win': score_to_win,
+        'seed': seed,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+class ResultsCache:
+    '''
+    Cached {'0': ..., '1': ...} scores of side-swapped pairs, by matchup key and pair number
+    '''
+    def __init__(self, path=DEFAULT_PATH):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS pairs (matchup TEXT, pair INTEGER, score_0 INTEGER, score_1 INTEGER, '
+                                'PRIMARY KEY (matchup, pair))')
+        self.uncommitted = 0
+
+    def get(self, matchup, n_pairs):
+        '''
+        {pair number: scores} of the cached pairs among the first n_pairs of a matchup
+        '''
+        rows = self.connection.execute('SELECT pair, score_0, score_1 FROM pairs WHERE matchup = ? AND pair < ?', (matchup, n_pairs))
+        return {pair: {'0': score_0, '1': score_1} for pair, score_0, score_1 in rows}
+
+    def put(self, matchup, pair, scores):
+        self.connection.execute('INSERT OR REPLACE INTO pairs VALUES (?, ?, ?, ?)', (matchup, pair, scores['0'], scores['1']))
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,164 @@
+'''
+Streaming, resumable log of the games of a tournament.
+
+A results log is an append-only binary file: a header that identifies the tournament (the matchup key of
+results_cache, the seed and the bots' names, as JSON), then one fixed-size record per game played:
+
+    pair number, flags, winner, bot 0's points, bot 1's points, frames, paddle hits, wall time
+
+The flags say which side bot 0 played on, and the game's seed is tournament.game_seed(seed, pair number, 1 if bot 0
+played on the right else 0). Records are buffered and written in batches of whole pairs, and every batch is flushed
+to disk, so the file is a checkpoint: opening the log of an interrupted tournament again cuts off a half-written batch
+and reads which pairs are done, and tournament.iter_pairs only plays the others. Pairs that tournament.iter_pairs
+takes from a results cache are never written to the log (the cache has no records of their games), so with a cache
+the log, and summarize, only cover the pairs that were actually played.
+
+summarize reads a log in chunks and only keeps running totals, so it works on logs far larger than memory:
+
+    python results_log.py results.log
+'''
+
+import json
+import os
+import struct
+import sys
+
+
+MAGIC = b'PONGLOG1'
+HEADER_LENGTH = struct.Struct('<I')
+# pair number, flags, winner (0: bot 0, 1: bot 1), bot 0's points, bot 1's points, frames, paddle hits, wall time in s
+RECORD = struct.Struct('<IBBHHIIf')
+PAIR_SIZE = 2*RECORD.size
+# flag: bot 0 played on the right
+BOT_0_RIGHT = 1
+# pairs are written to disk in batches of this many
+FLUSH_EVERY = 128
+# records read at a time by summarize
+CHUNK_RECORDS = 1 << 16
+
+
+def read_header(f):
+    '''
+    The description in the header of the log open as f, leaving f at the first record
+    '''
+    magic = f.read(len(MAGIC))
+    length = f.read(HEADER_LENGTH.size)
+    if magic != MAGIC or len(length) != HEADER_LENGTH.size:
+        raise ValueError('%s is not a results log' % f.name)
+    return json.loads(f.read(HEADER_LENGTH.unpack(length)[0]).decode())
+
+
+def iter_records(f):
+    '''
+    Records from the current position of f to its end, CHUNK_RECORDS at a time. A trailing partial record is skipped
+    '''
+    while True:
+        chunk = f.read(CHUNK_RECORDS*RECORD.size)
+        whole = len(chunk) - len(chunk) % RECORD.size
+        if whole:
+            yield from RECORD.iter_unpack(memoryview(chunk)[:whole])
+        if len(chunk) < CHUNK_RECORDS*RECORD.size:
+            return
+
+
+class ResultsLog:
+    '''
+    Writer of a results log. Opening an existing log continues it: pairs holds the {'0': ..., '1': ...} points of the
+    pairs already in it, by pair number. Continuing the log of another tournament (another description) raises
+    ValueError
+    '''
+    def __init__(self, path, description):
+        description = json.loads(json.dumps(description))  # as it reads back, e.g. tuples as lists
+        self.pairs = {}
+        self.buffer = bytearray()
+        self.buffered_pairs = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                if read_header(f) != description:
+                    raise ValueError('%s is the log of another tournament' % path)
+                data_start = f.tell()
+                records = iter_records(f)
+                for first in records:
+                    second = next(records, None)
+                    if second is None:
+                        break
+                    self.pairs[first[0]] = {'0': first[3] + second[3], '1': first[4] + second[4]}
+            # drop what was written after the last complete pair
+            os.truncate(path, data_start + len(self.pairs)*PAIR_SIZE)
+            self.file = open(path, 'ab')
+        else:
+            header = json.dumps(description, sort_keys=True).encode()
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+            self.flush()
+
+    def add_pair(self, pair, games):
+        '''
+        Log the games of a pair, as filled in by tournament.play_pair
+        '''
+        for game in games:
+            score_0, score_1 = game['scores']
+            self.buffer += RECORD.pack(pair, BOT_0_RIGHT if game['side'] else 0, 0 if score_0 > score_1 else 1, score_0, score_1,
+                                       game['frames'], game['hits'], game['time'])
+        self.buffered_pairs += 1
+        if self.buffered_pairs >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.buffer.clear()
+        self.buffered_pairs = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def summarize(path):
+    '''
+    Totals of a results log, read in one pass with constant memory
+    '''
+    games = 0
+    points = [0, 0]
+    wins = [0, 0]
+    wins_on_left = [0, 0]
+    frames = hits = max_frames = max_hits = 0
+    wall_time = 0.
+    with open(path, 'rb') as f:
+        description = read_header(f)
+        for pair, flags, winner, score_0, score_1, game_frames, game_hits, game_time in iter_records(f):
+            games += 1
+            points[0] += score_0
+            points[1] += score_1
+            wins[winner] += 1
+            if (winner == 0) == (not flags & BOT_0_RIGHT):
+                wins_on_left[winner] += 1
+            frames += game_frames
+            hits += game_hits
+            max_frames = max(max_frames, game_frames)
+            max_hits = max(max_hits, game_hits)
+            wall_time += game_time
+    return {
+        'description': description,
+        'games': games,
+        'points': {'0': points[0], '1': points[1]},
+        'wins': {'0': wins[0], '1': wins[1]},
+        'wins_on_left': {'0': wins_on_left[0], '1': wins_on_left[1]},
+        'mean_frames': frames/max(1, games),
+        'max_frames': max_frames,
+        'mean_hits': hits/max(1, games),
+        'max_hits': max_hits,
+        'wall_time': wall_time,
+    }
+
+
+if __name__ == '__main__':
+    summary = summarize(sys.argv[1])
+    print('Bots:', ' vs '.join(summary['description'].get('bots', [])), ' seed:', summary['description'].get('seed'))
+    print('%d games, points %s, games won %s (on the left: %s)' % (summary['games'], summary['points'], summary['wins'], summary['wins_on_left']))
+    print('frames per game: mean %.0f, max %d; paddle hits per game: mean %.1f, max %d' % (
+        summary['mean_frames'], summary['max_frames'], summary['mean_hits'], summary['max_hits']))
+    print('%.1fs of games, %.1f games/s' % (summary['wall_time'], summary['games']/summary['wall_time'] if summary['wall_time'] else 0))
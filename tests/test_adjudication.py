@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+import chaser_ai
+import pong_ai
+import pong_ai_new
+import pong_engine
+import tournament
+
+
+def play(left, right, seed, score_to_win, adjudicate, config=tournament.DEFAULT_CONFIG):
+    paddles, ball = pong_engine.new_match(**config, rng=random.Random(seed))
+    paddles[0].move_getter, paddles[1].move_getter = left, right
+    stats = {}
+    score = pong_engine.game_loop(paddles, ball, config['table_size'], score_to_win, adjudicate=adjudicate, stats=stats)
+    return score, stats
+
+
+@pytest.mark.parametrize('score_to_win', [1, 3, 5])
+def test_adjudication_keeps_chaser_scores(score_to_win):
+    for game in range(20):
+        full, full_stats = play(chaser_ai.pong_ai, chaser_ai.pong_ai, game, score_to_win, False)
+        judged, judged_stats = play(chaser_ai.pong_ai, chaser_ai.pong_ai, game, score_to_win, True)
+        assert judged == full
+        assert judged_stats['hits'] == full_stats['hits']
+        assert judged_stats['frames'] <= full_stats['frames']
+
+
+def test_adjudication_keeps_bot_scores():
+    config = dict(tournament.DEFAULT_CONFIG, dust_error=0.1)
+    for game in range(2):
+        full, _ = play(pong_ai_new.PongAI(), pong_ai.PongAI(), game, 2, False, config)
+        judged, _ = play(pong_ai_new.PongAI(), pong_ai.PongAI(), game, 2, True, config)
+        assert judged == full
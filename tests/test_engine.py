@@ -0,0 +1,83 @@
+import gc
+import random
+
+import pytest
+
+import chaser_ai
+import pong_ai
+import pong_engine
+import tournament
+
+
+CONFIG = dict(tournament.DEFAULT_CONFIG, dust_error=0.1)
+
+# (score, frames, paddle hits) of seeded chaser vs chaser matches to 3 points. A change that moves any of these changed
+# the physics: update them only on purpose
+GOLDEN = {
+    (False, 1): ([0, 3], 2227, 19),
+    (False, 2): ([1, 3], 3808, 24),
+    (False, 3): ([1, 3], 3694, 31),
+    (True, 1): ([3, 0], 1992, 13),
+    (True, 2): ([3, 2], 3909, 21),
+    (True, 3): ([3, 0], 2708, 47),
+}
+
+
+def play(left, right, seed, swept=False, score_to_win=3):
+    paddles, ball = pong_engine.new_match(**CONFIG, rng=random.Random(seed))
+    paddles[0].move_getter, paddles[1].move_getter = left, right
+    stats = {}
+    score = pong_engine.game_loop(paddles, ball, CONFIG['table_size'], score_to_win, swept=swept, stats=stats)
+    return score, stats['frames'], stats['hits']
+
+
+@pytest.mark.parametrize('swept, seed', sorted(GOLDEN))
+def test_seeded_chaser_matches_are_unchanged(swept, seed):
+    assert play(chaser_ai.pong_ai, chaser_ai.pong_ai, seed, swept) == GOLDEN[swept, seed]
+
+
+def test_seeded_match_ignores_global_random():
+    random.seed(1)
+    first = play(pong_ai.PongAI(), chaser_ai.pong_ai, 'a')
+    random.seed(2)
+    random.random()
+    assert play(pong_ai.PongAI(), chaser_ai.pong_ai, 'a') == first
+
+
+def test_wall_overlap_matches_pygame_rect():
+    # Ball.move tests wall overlap with integer truncation instead of pygame.Rect.colliderect, as the original did
+    pygame = pytest.importorskip('pygame')
+    table_size = CONFIG['table_size']
+    walls = [pygame.Rect((-100, -100), (table_size[0] + 200, 100)), pygame.Rect((-100, table_size[1]), (table_size[0] + 200, 100))]
+    ball = pong_engine.fRect((0, 0), CONFIG['ball_size'])
+    rng = random.Random(0)
+    for _ in range(20000):
+        ball.pos[0] = rng.uniform(0, table_size[0] - 15)
+        ball.pos[1] = rng.uniform(-3, 3) if rng.random() < .5 else rng.uniform(table_size[1] - 18, table_size[1] - 12)
+        rect = pygame.Rect(ball.pos, ball.size)
+        assert (int(ball.pos[1]) < 0) == bool(rect.colliderect(walls[0]))
+        assert (int(ball.pos[1]) + int(ball.size[1]) > table_size[1]) == bool(rect.colliderect(walls[1]))
+
+
+def test_views_are_updated_and_read_only():
+    paddles, ball = pong_engine.new_match(**CONFIG)
+    views = paddles[0].get_views(paddles[1].frect, ball.frect)
+    ball.frect.move_ip(3, 4)
+    assert paddles[0].get_views(paddles[1].frect, ball.frect) is views
+    assert views[2].pos == tuple(ball.frect.pos)
+    with pytest.raises(TypeError):
+        views[2].pos[0] = 0
+    with pytest.raises(AttributeError):
+        views[2].pos = [0, 0]
+
+
+def test_views_hold_no_reference_to_the_rectangle():
+    paddles, ball = pong_engine.new_match(**CONFIG)
+    view = pong_engine.FrozenRect(ball.frect)
+    seen, todo = set(), [view]
+    while todo:
+        value = todo.pop()
+        assert value is not ball.frect and value is not ball.frect.pos
+        if id(value) not in seen and not isinstance(value, type):
+            seen.add(id(value))
+            todo += gc.get_referents(value)
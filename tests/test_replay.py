@@ -0,0 +1,42 @@
+import random
+
+import chaser_ai
+import pong_ai
+import pong_engine
+import replay
+import tournament
+
+
+CONFIG = dict(tournament.DEFAULT_CONFIG, dust_error=0.1)
+
+
+def snapshot(paddles, ball, score):
+    return paddles[0].frect.pos[1], paddles[1].frect.pos[1], tuple(ball.frect.pos), ball.speed, list(score), ball.hits
+
+
+def test_replay_matches_the_match(tmp_path):
+    path = str(tmp_path / 'match.rpl')
+    score = replay.record_match(pong_ai.PongAI(), chaser_ai.pong_ai, path, CONFIG, score_to_win=3, seed='r', keyframe_interval=64)
+
+    paddles, ball = pong_engine.new_match(**CONFIG, rng=random.Random('r'))
+    paddles[0].move_getter, paddles[1].move_getter = pong_ai.PongAI(), chaser_ai.pong_ai
+    stats = {}
+    assert pong_engine.game_loop(paddles, ball, CONFIG['table_size'], 3, stats=stats) == score
+
+    recorded = replay.Replay(path)
+    assert len(recorded) == stats['frames']
+    assert recorded.score == score
+    assert recorded.state_at(len(recorded))[2] == score
+
+
+def test_seeking_matches_playing_through(tmp_path):
+    path = str(tmp_path / 'match.rpl')
+    replay.record_match(chaser_ai.pong_ai, chaser_ai.pong_ai, path, CONFIG, score_to_win=2, seed=5, keyframe_interval=64)
+    recorded = replay.Replay(path)
+
+    checked = 0
+    for frame, paddles, ball, score in recorded.iter_states():
+        if frame % 37 == 0 or frame == len(recorded):
+            assert snapshot(*recorded.state_at(frame)) == snapshot(paddles, ball, score)
+            checked += 1
+    assert checked > 10
@@ -0,0 +1,35 @@
+import chaser_ai
+import pong_ai
+import results_cache
+import tournament
+
+
+BOTS = (pong_ai.PongAI(), chaser_ai.pong_ai)
+
+
+def key():
+    return results_cache.matchup_key(BOTS, tournament.DEFAULT_CONFIG, 1, 7)
+
+
+def test_key_follows_engine(tmp_path, monkeypatch):
+    engine = tmp_path / 'pong_engine.py'
+    monkeypatch.setattr(results_cache, 'DEPENDENCIES', [str(engine)])
+
+    keys = {key()}
+    engine.write_text('engine')
+    keys.add(key())
+    engine.write_text('engine, changed')
+    keys.add(key())
+    assert len(keys) == 3
+    assert key() == key()
+
+
+def test_cached_pairs_are_not_played_again(tmp_path, monkeypatch):
+    with results_cache.ResultsCache(str(tmp_path / 'cache.sqlite')) as cache:
+        first = tournament.run_tournament(BOTS, 3, processes=1, seed=7, cache=cache)
+        assert len(cache.get(key(), 3)) == 3
+
+        def play_pair(*args, **kwargs):
+            raise AssertionError('cached pair played again')
+        monkeypatch.setattr(tournament, 'play_pair', play_pair)
+        assert tournament.run_tournament(BOTS, 3, processes=1, seed=7, cache=cache) == first
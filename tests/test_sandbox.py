@@ -0,0 +1,19 @@
+import chaser_ai
+import tournament
+
+
+class RaisingBot:
+    def reset(self):
+        pass
+
+    def decide(self, paddle_frect, other_paddle_frect, ball_frect, table_size):
+        raise ValueError('no move')
+
+
+def test_sandboxed_bot_prints_one_traceback(capfd):
+    stats = {}
+    tournament.play_game(RaisingBot(), chaser_ai.pong_ai, tournament.DEFAULT_CONFIG, score_to_win=2, sandbox=True, stats=stats, seed=1)
+    assert stats['frames'] > 100
+    err = capfd.readouterr().err
+    assert err.count('Traceback') == 1
+    assert 'ValueError: no move' in err
@@ -0,0 +1,50 @@
+import chaser_ai
+import pong_ai
+import tournament
+
+
+CONFIG = dict(tournament.DEFAULT_CONFIG, dust_error=0.1)
+BOTS = (pong_ai.PongAI(), chaser_ai.pong_ai)
+
+
+def test_seeded_totals_do_not_depend_on_processes():
+    serial = tournament.run_tournament(BOTS, 6, CONFIG, processes=1, seed=7)
+    parallel = tournament.run_tournament(BOTS, 6, CONFIG, processes=3, seed=7)
+    assert serial == parallel
+
+
+def test_seeded_game_replays_alone():
+    games = []
+    tournament.play_pair(BOTS, CONFIG, games=games, seed=7, pair=3)
+    for game in games:
+        left, right = (BOTS[1], BOTS[0]) if game['side'] else BOTS
+        stats = {}
+        tournament.play_game(left, right, CONFIG, stats=stats, seed=tournament.game_seed(7, 3, game['side']))
+        assert (stats['frames'], stats['hits']) == (game['frames'], game['hits'])
+
+
+def test_seeded_sequential_test_does_not_depend_on_processes():
+    serial = tournament.sequential_test(BOTS, 50, CONFIG, processes=1, seed=3)
+    parallel = tournament.sequential_test(BOTS, 50, CONFIG, processes=3, seed=3)
+    assert serial['winner'] is not None
+    assert serial == parallel
+
+
+def test_ordered_pairs_come_in_pair_order():
+    pairs = list(tournament.iter_pairs(BOTS, 6, CONFIG, processes=3, seed=7, ordered=True))
+    assert pairs == [tournament.play_pair(BOTS, CONFIG, seed=7, pair=index) for index in range(6)]
+
+
+def test_sandboxed_sequential_test_stops_playing(monkeypatch):
+    submit_bounded = tournament._submit_bounded
+    submitted = []
+
+    def counting_submit_bounded(executor, tasks, limit):
+        # tasks are only taken from the iterator when they are submitted to the pool
+        return submit_bounded(executor, (submitted.append(task) or task for task in tasks), limit)
+
+    monkeypatch.setattr(tournament, '_submit_bounded', counting_submit_bounded)
+    result = tournament.sequential_test(BOTS, 200, CONFIG, processes=2, sandbox=True, seed=1)
+    assert result['winner'] is not None and result['pairs'] < 12
+    # the pairs being played when the test stopped are finished, the rest of the 200 are never submitted
+    assert result['pairs'] <= len(submitted) < 20
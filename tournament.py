@@ -0,0 +1,316 @@
+'''
+Multi-core tournament runner for PongAIvAI.
+
+A tournament is a number of side-swapped game pairs between two bots: in every pair bot 0 plays once on the left
+and once on the right. Pairs are handed out to a pool of worker processes one at a time from a shared queue, so a
+worker that finished its short games just takes the next pair while another one is still busy with a long rally.
+
+Bots are given as bot objects (e.g. pong_ai.PongAI()) or legacy move_getter functions (e.g. chaser_ai.pong_ai). Every
+game plays with fresh copies of the bots, so a bot can even play against itself. Bots are pickled to send them to the
+workers, so their classes and functions must be defined at module level.
+
+With enforce_timeout=True every move that takes longer than config['timeout'] is dropped, as in the contest (see
+pong_engine.DeadlineBot). The results then depend on the speed of the machine.
+
+With sandbox=True every bot plays in a process of its own (see bot_sandbox.SandboxBot), so a bot that crashes only
+loses its moves instead of stopping the tournament, and with enforce_timeout a bot that hangs cannot stall it either.
+
+Pass a profiler.Profile as profile to time every move (and the profile's instrumented helper functions) in every
+game. Helper functions of sandboxed bots run in the bot processes and are not timed.
+
+With a seed, every game gets a random.Random of its own, seeded with the tournament seed, the pair number and the
+game in the pair (see game_seed). The games then do not depend on which worker plays them or in which order, so a
+game can be replayed alone and any number of processes give the same totals as one. With a results_cache.ResultsCache
+as cache as well, pairs that were already played with the same bots, physics and seed are taken from the cache instead
+of played again.
+
+With log set to a file name, every game played is appended to that results log (see results_log.py). Running the
+same tournament with the same log again continues where it stopped. Pairs taken from the cache are not played, so they
+are never written to the log: the cache only keeps their points, not the games' frames, hits and times.
+
+sequential_test plays pairs only until it is clear which bot is better, instead of a fixed number of them.
+'''
+
+import concurrent.futures
+import copy
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import time
+
+import bot_sandbox
+import pong_engine
+import profiler
+import results_cache
+import results_log
+
+
+# Physics configuration used by init_game in PongAIvAI.py
+DEFAULT_CONFIG = {
+    'table_size': (440, 280),
+    'paddle_size': (10, 70),
+    'ball_size': (15, 15),
+    'paddle_speed': 1,
+    'max_angle': 45,
+    'paddle_bounce': 1.2,
+    'wall_bounce': 1.00,
+    'dust_error': 0.00,
+    'init_speed_mag': 2,
+    'timeout': 0.0003,
+}
+
+
+def game_seed(seed, pair, game):
+    '''
+    Seed of game 0 (bot 0 on the left) or 1 of a tournament pair
+    '''
+    return '%s:%d:%d' % (seed, pair, game)
+
+
+def play_game(left_bot, right_bot, config, score_to_win=1, enforce_timeout=False, sandbox=False, profile=None, stats=None, seed=None):
+    '''
+    Play one headless match on a fresh table and return the final [left, right] score.
+    If stats is a dict, the match's 'frames', 'hits' (see pong_engine.game_loop) and wall 'time' are stored in it.
+    With a seed, the match draws its random numbers from its own random.Random(seed) instead of the random module
+    '''
+    paddles, ball = pong_engine.new_match(**config, rng=None if seed is None else random.Random(seed))
+    sandboxes = []
+    if sandbox:
+        # the bot processes get their own copies anyway
+        time_limit = config['timeout'] if enforce_timeout else None
+        bots = sandboxes = [bot_sandbox.SandboxBot(left_bot, time_limit), bot_sandbox.SandboxBot(right_bot, time_limit)]
+    else:
+        # copies, so the two sides never share the state of one bot object (functions are not copied)
+        bots = [copy.deepcopy(left_bot), copy.deepcopy(right_bot)]
+    if profile is not None:
+        bots = [profile.wrap(bots[0], profiler.bot_name(left_bot)), profile.wrap(bots[1], profiler.bot_name(right_bot))]
+    if enforce_timeout and not sandbox:
+        bots = [pong_engine.DeadlineBot(bot, config['timeout']) for bot in bots]
+    paddles[0].move_getter, paddles[1].move_getter = bots
+    start = time.perf_counter()
+    try:
+        return pong_engine.game_loop(paddles, ball, config['table_size'], score_to_win, stats=stats)
+    finally:
+        if stats is not None:
+            stats['time'] = time.perf_counter() - start
+        for bot in sandboxes:
+            bot.close()
+
+
+def play_pair(bots, config, score_to_win=1, enforce_timeout=False, sandbox=False, profile=None, games=None, seed=None, pair=0):
+    '''
+    Play bots[0] against bots[1] twice, once from each side, and return the points won as {'0': ..., '1': ...}.
+    If games is a list, the stats of both games (see play_game) are appended to it, with 'side' (0 if bot 0 played
+    on the left) and 'scores' (bot 0's and bot 1's points).
+    With a seed, the games are seeded with game_seed(seed, pair, 0) and game_seed(seed, pair, 1)
+    '''
+    scores = {'0': 0, '1': 0}
+
+    stats = {'side': 0}
+    game_score = play_game(bots[0], bots[1], config, score_to_win, enforce_timeout, sandbox, profile, stats,
+                           None if seed is None else game_seed(seed, pair, 0))
+    scores['0'] += game_score[0]
+    scores['1'] += game_score[1]
+    stats['scores'] = (game_score[0], game_score[1])
+    if games is not None:
+        games.append(stats)
+
+    stats = {'side': 1}
+    game_score = play_game(bots[1], bots[0], config, score_to_win, enforce_timeout, sandbox, profile, stats,
+                           None if seed is None else game_seed(seed, pair, 1))
+    scores['1'] += game_score[0]
+    scores['0'] += game_score[1]
+    stats['scores'] = (game_score[1], game_score[0])
+    if games is not None:
+        games.append(stats)
+    return scores
+
+
+def _play_pair_task(task):
+    index, bots, config, score_to_win, enforce_timeout, sandbox, profile, seed = task
+    games = []
+    if profile is None:
+        return index, play_pair(bots, config, score_to_win, enforce_timeout, sandbox, None, games, seed, index), None, games
+    # profile is this pair's own empty Profile, which goes back to iter_pairs with the scores
+    with profile.instrumented():
+        return index, play_pair(bots, config, score_to_win, enforce_timeout, sandbox, profile, games, seed, index), profile, games
+
+
+def iter_pairs(bots, n_pairs, config=None, score_to_win=1, processes=None, enforce_timeout=False, sandbox=False, profile=None,
+               seed=None, cache=None, log=None, ordered=False):
+    '''
+    Play n_pairs side-swapped pairs and yield each pair's {'0': ..., '1': ...} points as soon as it finishes.
+    Results arrive in completion order, or with ordered=True in pair number order (pairs that finish early wait for
+    the ones before them). processes=1 plays everything in this process, None uses every core.
+    The timings of a finished pair are added to profile (if given) before its points are yielded.
+    With a seed and a cache, cached pairs are yielded first and only the others are played (and added to the cache).
+    Games with enforce_timeout depend on the speed of the machine and are never cached.
+    With a log, the pairs already in the log are yielded first and are not played again either.
+    '''
+    pairs = _iter_indexed_pairs(bots, n_pairs, config, score_to_win, processes, enforce_timeout, sandbox, profile, seed, cache, log)
+    try:
+        for index, pair_scores in _in_order(pairs) if ordered else pairs:
+            yield pair_scores
+    finally:
+        # stop playing as soon as the caller stops asking, e.g. sequential_test
+        pairs.close()
+
+
+def _in_order(pairs):
+    '''
+    The (index, scores) of pairs, which come in any order, in index order from 0
+    '''
+    waiting = {}
+    next_index = 0
+    for index, pair_scores in pairs:
+        waiting[index] = pair_scores
+        while next_index in waiting:
+            yield next_index, waiting.pop(next_index)
+            next_index += 1
+
+
+def _iter_indexed_pairs(bots, n_pairs, config, score_to_win, processes, enforce_timeout, sandbox, profile, seed, cache, log):
+    '''
+    (index, scores) of the pairs of iter_pairs, in completion order
+    '''
+    config = DEFAULT_CONFIG if config is None else config
+    bots = tuple(bots)
+    matchup, done = None, {}
+    if cache is not None and seed is not None and not enforce_timeout:
+        matchup = results_cache.matchup_key(bots, config, score_to_win, seed)
+        done.update(cache.get(matchup, n_pairs))
+    if log is not None:
+        log = results_log.ResultsLog(log, {'matchup': results_cache.matchup_key(bots, config, score_to_win, seed), 'seed': seed,
+                                           'bots': [profiler.bot_name(bot) for bot in bots], 'score_to_win': score_to_win})
+        done.update((index, pair_scores) for index, pair_scores in log.pairs.items() if index < n_pairs)
+    for index in sorted(done):
+        yield index, done[index]
+
+    tasks = ((index, bots, config, score_to_win, enforce_timeout, sandbox, None if profile is None else profile.copy_empty(), seed)
+             for index in range(n_pairs) if index not in done)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    try:
+        if processes == 1:
+            yield from _collect(map(_play_pair_task, tasks), profile, cache, matchup, log)
+            return
+
+        if sandbox:
+            # the workers start the bot processes, and multiprocessing.Pool's daemonic workers may not have children
+            with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+                yield from _collect(_submit_bounded(executor, tasks, processes), profile, cache, matchup, log)
+            return
+
+        with multiprocessing.Pool(processes) as pool:
+            # chunksize 1: every idle worker grabs the next pair, so long games never hold up a batch of short ones
+            yield from _collect(pool.imap_unordered(_play_pair_task, tasks, chunksize=1), profile, cache, matchup, log)
+    finally:
+        # also when the caller stops early
+        if matchup is not None:
+            cache.commit()
+        if log is not None:
+            log.close()
+
+
+def _submit_bounded(executor, tasks, limit):
+    '''
+    Results of _play_pair_task for tasks, in completion order, with at most limit tasks submitted to executor at a
+    time. Leaving the executor waits for every submitted task, so a caller that stops early only waits for the pairs
+    that are being played
+    '''
+    tasks = iter(tasks)
+    pending = {executor.submit(_play_pair_task, task) for task in itertools.islice(tasks, limit)}
+    try:
+        while pending:
+            finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                task = next(tasks, None)
+                if task is not None:
+                    pending.add(executor.submit(_play_pair_task, task))
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _collect(results, profile, cache, matchup, log):
+    for index, pair_scores, pair_profile, games in results:
+        if pair_profile is not None:
+            profile.merge(pair_profile)
+        if matchup is not None:
+            cache.put(matchup, index, pair_scores)
+        if log is not None:
+            log.add_pair(index, games)
+        yield index, pair_scores
+
+
+def run_tournament(bots, n_pairs, config=None, score_to_win=1, processes=None, enforce_timeout=False, sandbox=False, profile=None,
+                   seed=None, cache=None, log=None):
+    '''
+    Play n_pairs side-swapped pairs on a process pool and return the total {'0': ..., '1': ...} scores
+    '''
+    scores = {'0': 0, '1': 0}
+    for pair_scores in iter_pairs(bots, n_pairs, config, score_to_win, processes, enforce_timeout, sandbox, profile, seed, cache, log):
+        scores['0'] += pair_scores['0']
+        scores['1'] += pair_scores['1']
+    return scores
+
+
+def sequential_test(bots, max_pairs=1000, config=None, score_to_win=1, processes=None, enforce_timeout=False, sandbox=False,
+                    profile=None, seed=None, cache=None, log=None, margin=0.05, alpha=0.05, beta=0.05, progress=None):
+    '''
+    Play side-swapped pairs until it is statistically clear which bot wins more points, or until max_pairs pairs.
+
+    Every point is taken as a coin flip that bot 0 wins with probability p. After every pair, a sequential probability
+    ratio test (SPRT) weighs p = 0.5 + margin (bot 0 is better) against p = 0.5 - margin (bot 1 is better) and stops
+    as soon as one is accepted. If bot 1 is at least that much better, bot 0 is named the winner with probability at
+    most alpha, and the other way round at most beta. The closer the bots, the longer it takes; bots within the margin
+    of each other are called either way. Pairs are counted in pair number order, so that the test does not favour
+    pairs with short games and a seeded test stops at the same pair with the same result on any number of processes.
+    Pairs still being played, or finished after a pair that was, when the test stops are dropped.
+
+    progress (if given) is called with the result so far after every pair.
+    Returns a dict of
+        'winner': '0' or '1', None if max_pairs were played without a decision
+        'scores': {'0': ..., '1': ...} points won
+        'pairs': pairs played
+        'win_rate': fraction of the points won by bot 0
+        'interval': (low, high) confidence interval of bot 0's win rate, at level 1 - alpha (Wilson score interval)
+        'llr': log-likelihood ratio of "bot 0 is better" against "bot 1 is better"
+    '''
+    upper = math.log((1 - beta)/alpha)
+    lower = math.log(beta/(1 - alpha))
+    win_llr = math.log((0.5 + margin)/(0.5 - margin))
+    z = statistics.NormalDist().inv_cdf(1 - alpha/2)
+
+    result = {'winner': None, 'scores': {'0': 0, '1': 0}, 'pairs': 0, 'win_rate': 0.5, 'interval': (0, 1), 'llr': 0}
+    for pair_scores in iter_pairs(bots, max_pairs, config, score_to_win, processes, enforce_timeout, sandbox, profile, seed, cache, log,
+                                  ordered=True):
+        scores = result['scores']
+        scores['0'] += pair_scores['0']
+        scores['1'] += pair_scores['1']
+        result['pairs'] += 1
+
+        n = scores['0'] + scores['1']
+        if n:
+            p = scores['0']/n
+            centre = (p + z*z/(2*n))/(1 + z*z/n)
+            half_width = z*math.sqrt(p*(1 - p)/n + z*z/(4*n*n))/(1 + z*z/n)
+            result['win_rate'] = p
+            result['interval'] = (max(0, centre - half_width), min(1, centre + half_width))
+        # a point won by bot 0 is win_llr more likely if it is better, a point it loses as much less likely
+        result['llr'] = (scores['0'] - scores['1'])*win_llr
+        if result['llr'] >= upper:
+            result['winner'] = '0'
+        elif result['llr'] <= lower:
+            result['winner'] = '1'
+
+        if progress is not None:
+            progress(result)
+        if result['winner'] is not None:
+            break
+    return result